@@ -6,7 +6,7 @@ from tkinter import messagebox, ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 
-from RestaurantDatabaseManager import RestaurantDatabaseManager
+from RestaurantDatabaseManager import format_money
 
 ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
 
@@ -29,9 +29,10 @@ def _load_tk_image(filename, size=None):
 
 
 class Dashboard(tk.Frame):
-    def __init__(self, parent, colors):
+    def __init__(self, parent, colors, db, worker):
         super().__init__(parent, bg=colors["background"])
-        self.db = RestaurantDatabaseManager()
+        self.db = db
+        self.worker = worker
         self.colors = colors
         self._images = []  # prevent garbage collection
         self.build_ui()
@@ -47,11 +48,16 @@ class Dashboard(tk.Frame):
         # Banner image
         self._build_banner()
 
-        # Smart Insights
-        self.build_smart_insights()
-
-        # KPI Cards (responsive grid)
-        self.build_kpi_section()
+        # Smart Insights and KPI cards are filled in once the DB worker
+        # returns; the slots keep their place in the layout meanwhile.
+        self.insights_slot = tk.Frame(self, bg=c["background"])
+        self.insights_slot.pack(fill="x")
+        self.kpi_slot = tk.Frame(self, bg=c["background"])
+        self.kpi_slot.pack(fill="x")
+        self._loading_label(self.kpi_slot, "Loading today's numbers...")
+        self.worker.call(
+            self.load_overview, on_done=self.show_overview, owner=self
+        )
 
         # Quick POS section
         self._build_pos_section()
@@ -101,7 +107,49 @@ class Dashboard(tk.Frame):
 
         cat_canvas = tk.Frame(cat_card, bg=c["surface"])
         cat_canvas.pack(fill="both", expand=True, padx=16, pady=(0, 16))
-        self.create_category_chart(cat_canvas)
+        self._loading_label(cat_canvas, "Loading...")
+        self.worker.call(
+            "get_category_performance",
+            on_done=lambda cat_data: self.create_category_chart(cat_canvas, cat_data),
+            owner=self,
+        )
+
+    def _loading_label(self, parent, text):
+        for w in parent.winfo_children():
+            w.destroy()
+        tk.Label(
+            parent,
+            text=text,
+            bg=parent.cget("bg"),
+            fg=self.colors["text_muted"],
+            font=("Segoe UI", 10),
+        ).pack(expand=True, pady=20)
+
+    # ── Overview data (runs on the DB worker) ───────────────────
+
+    @staticmethod
+    def load_overview(db):
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        yesterday = (now - timedelta(days=1)).strftime("%Y-%m-%d")
+        seven_days_ago = (now - timedelta(days=7)).strftime("%Y-%m-%d")
+        return {
+            "summary": db.get_sales_summary(),
+            "yesterday": db.get_revenue_by_period(
+                "daily", date_range=[yesterday, yesterday]
+            ),
+            "week": db.get_revenue_by_period(
+                "daily", date_range=[seven_days_ago, today]
+            ),
+            "hourly": db.get_hourly_sales_pattern(),
+            "low_stock": db.get_inventory(low_stock_only=True),
+        }
+
+    def show_overview(self, data):
+        for w in self.kpi_slot.winfo_children():
+            w.destroy()
+        self.build_smart_insights(data)
+        self.build_kpi_section(data)
 
     # ── Banner ──────────────────────────────────────────────────
 
@@ -158,14 +206,14 @@ class Dashboard(tk.Frame):
 
     # ── Smart Insights ──────────────────────────────────────────
 
-    def build_smart_insights(self):
+    def build_smart_insights(self, data):
         c = self.colors
-        insights = self._generate_insights()
+        insights = self._generate_insights(data)
         if not insights:
             return
 
         card = tk.Frame(
-            self,
+            self.insights_slot,
             bg=c["surface"],
             bd=1,
             relief="solid",
@@ -214,32 +262,32 @@ class Dashboard(tk.Frame):
                 anchor="w",
             ).pack(side="left", fill="x", expand=True, padx=(0, 8), pady=6)
 
-    def _generate_insights(self):
+    def _generate_insights(self, data):
         insights = []
         try:
-            seven_days_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-            today = datetime.now().strftime("%Y-%m-%d")
-            sales_data = self.db.get_sales_data(date_range=[seven_days_ago, today])
+            daily = data["week"]
 
             daily_totals = {}
-            if sales_data:
-                for sale in sales_data:
-                    day_key = sale[8] + " (" + sale[6] + ")"
-                    daily_totals[day_key] = daily_totals.get(day_key, 0) + sale[5]
+            for day, _, revenue in daily:
+                weekday = datetime.strptime(day, "%Y-%m-%d").strftime("%A")
+                daily_totals[weekday + " (" + day + ")"] = revenue
 
             if len(daily_totals) > 1:
                 best_key, best_val = max(daily_totals.items(), key=lambda x: x[1])
                 slow_key, slow_val = min(daily_totals.items(), key=lambda x: x[1])
                 if best_key != slow_key:
-                    text = "This past week, {} was your best day with ${:.2f} in sales. {} was your slowest at ${:.2f}.".format(
-                        best_key, best_val, slow_key, slow_val
+                    text = "This past week, {} was your best day with {} in sales. {} was your slowest at {}.".format(
+                        best_key,
+                        format_money(best_val),
+                        slow_key,
+                        format_money(slow_val),
                     )
                     insights.append({"type": "Insight", "text": text})
         except Exception:
             pass
 
         try:
-            hourly_data = self.db.get_hourly_sales_pattern()
+            hourly_data = data["hourly"]
             if hourly_data:
                 peak = max(hourly_data, key=lambda x: x[1])
                 hour = int(peak[0])
@@ -253,7 +301,7 @@ class Dashboard(tk.Frame):
             pass
 
         try:
-            low_stock = self.db.get_inventory(low_stock_only=True)
+            low_stock = data["low_stock"]
             if low_stock:
                 names = [item[1] for item in low_stock[:3]]
                 more = "..." if len(low_stock) > 3 else ""
@@ -268,16 +316,14 @@ class Dashboard(tk.Frame):
 
     # ── KPI Cards ───────────────────────────────────────────────
 
-    def build_kpi_section(self):
+    def build_kpi_section(self, data):
         c = self.colors
-        kpi_frame = tk.Frame(self, bg=c["background"])
+        kpi_frame = tk.Frame(self.kpi_slot, bg=c["background"])
         kpi_frame.pack(fill="x", pady=(0, 4))
 
-        summary = self.db.get_sales_summary()
-        today = datetime.now().strftime("%Y-%m-%d")
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        yesterday_sales = self.db.get_sales_data([yesterday, yesterday])
-        yesterday_rev = sum(s[5] for s in yesterday_sales) if yesterday_sales else 0
+        summary = data["summary"]
+        yesterday_sales = data["yesterday"]
+        yesterday_rev = yesterday_sales[0][2] if yesterday_sales else 0
 
         today_rev = summary["today"]["revenue"]
         change = (
@@ -296,7 +342,7 @@ class Dashboard(tk.Frame):
         cards_data = [
             (
                 "Today's Revenue",
-                "${:.2f}".format(today_rev),
+                format_money(today_rev),
                 "{:+.1f}% vs yesterday".format(change),
                 c["success"] if change >= 0 else c["error"],
                 c["success_light"] if change >= 0 else c["error_light"],
@@ -310,7 +356,7 @@ class Dashboard(tk.Frame):
             ),
             (
                 "Monthly Revenue",
-                "${:.2f}".format(summary["month"]["revenue"]),
+                format_money(summary["month"]["revenue"]),
                 "{} orders".format(summary["month"]["count"]),
                 c["accent"],
                 c["accent_light"],
@@ -542,7 +588,7 @@ class Dashboard(tk.Frame):
             fg=c["text_primary"],
             font=("Segoe UI", 12, "bold"),
         ).pack(side="left")
-        self._pos_total_var = tk.StringVar(value="$0.00")
+        self._pos_total_var = tk.StringVar(value=format_money(0))
         tk.Label(
             total_frame,
             textvariable=self._pos_total_var,
@@ -692,7 +738,7 @@ class Dashboard(tk.Frame):
 
             tk.Label(
                 inner,
-                text="${:.2f}".format(price),
+                text=format_money(price),
                 bg=c["surface"],
                 fg=c["accent"],
                 font=("Segoe UI", 12, "bold"),
@@ -764,10 +810,10 @@ class Dashboard(tk.Frame):
                 justify="center",
             )
             self._order_empty_label.pack(expand=True)
-            self._pos_total_var.set("$0.00")
+            self._pos_total_var.set(format_money(0))
             return
 
-        total = 0.0
+        total = 0
         for item_id, info in self._pos_order.items():
             line_total = info["price"] * info["qty"]
             total += line_total
@@ -789,7 +835,7 @@ class Dashboard(tk.Frame):
             ).pack(fill="x")
             tk.Label(
                 info_frame,
-                text="${:.2f} x {}".format(info["price"], info["qty"]),
+                text="{} x {}".format(format_money(info["price"]), info["qty"]),
                 bg=c["surface_alt"],
                 fg=c["text_muted"],
                 font=("Segoe UI", 8),
@@ -802,7 +848,7 @@ class Dashboard(tk.Frame):
 
             tk.Label(
                 right_col,
-                text="${:.2f}".format(line_total),
+                text=format_money(line_total),
                 bg=c["surface_alt"],
                 fg=c["text_primary"],
                 font=("Segoe UI", 9, "bold"),
@@ -840,48 +886,66 @@ class Dashboard(tk.Frame):
             )
             plus_btn.pack(side="left")
 
-        self._pos_total_var.set("${:.2f}".format(total))
+        self._pos_total_var.set(format_money(total))
 
     def _pos_checkout(self):
         if not self._pos_order:
             messagebox.showwarning("Empty Order", "Add items to the order first.")
             return
 
-        # Validate stock for all items
-        for item_id, info in self._pos_order.items():
-            if not self.db.check_stock_for_sale(item_id, info["qty"]):
-                messagebox.showerror(
-                    "Stock Error", "Not enough stock for '{}'.".format(info["name"])
-                )
-                return
+        lines = [
+            {
+                "menu_item_id": item_id,
+                "item_name": info["name"],
+                "category": info["category"],
+                "quantity": info["qty"],
+                "unit_price": info["price"],
+                "total_amount": info["price"] * info["qty"],
+            }
+            for item_id, info in self._pos_order.items()
+        ]
 
-        # Record each sale
-        errors = []
-        for item_id, info in self._pos_order.items():
-            line_total = info["price"] * info["qty"]
-            try:
-                self.db.record_sale(
-                    menu_item_id=item_id,
-                    item_name=info["name"],
-                    category=info["category"],
-                    quantity=info["qty"],
-                    unit_price=info["price"],
-                    total_amount=line_total,
-                )
-            except Exception as e:
-                errors.append(str(e))
+        # Check and record on the DB worker; a locked database must not
+        # freeze the POS. The button stays disabled until the answer lands.
+        self._pos_checkout_btn.config(state="disabled", text="Recording...")
+        self.worker.call(
+            "checkout_order",
+            lines,
+            on_done=lambda result: self._pos_checkout_done(lines, *result),
+            on_error=lambda error: self._pos_checkout_done(lines, False, []),
+            owner=self,
+        )
 
-        if errors:
-            messagebox.showerror("Error", "Some sales failed:\n" + "\n".join(errors))
-        else:
-            total = sum(i["price"] * i["qty"] for i in self._pos_order.values())
-            items_count = sum(i["qty"] for i in self._pos_order.values())
-            messagebox.showinfo(
-                "Sale Complete",
-                "\u2713 Order completed!\n\nItems: {}\nTotal: ${:.2f}".format(
-                    items_count, total
+    def _pos_checkout_done(self, lines, recorded, shortfalls):
+        self._pos_checkout_btn.config(state="normal", text="\u2713  Complete Sale")
+
+        if shortfalls is None:
+            messagebox.showerror("Stock Error", "Could not check stock levels.")
+            return
+        if shortfalls:
+            messagebox.showerror(
+                "Stock Error",
+                "Not enough stock for this order:\n"
+                + "\n".join(
+                    "- {}: need {:g} {}, have {:g}".format(
+                        name, needed, unit or "", stock or 0
+                    )
+                    for _, name, unit, needed, stock in shortfalls
                 ),
             )
+            return
+        if not recorded:
+            messagebox.showerror("Error", "Failed to record the order.")
+            return
+
+        total = sum(line["total_amount"] for line in lines)
+        items_count = sum(line["quantity"] for line in lines)
+        messagebox.showinfo(
+            "Sale Complete",
+            "\u2713 Order completed!\n\nItems: {}\nTotal: {}".format(
+                items_count, format_money(total)
+            ),
+        )
 
         self._pos_clear_order()
 
@@ -893,11 +957,40 @@ class Dashboard(tk.Frame):
     # ── Revenue Chart ───────────────────────────────────────────
 
     def update_revenue_chart(self, event=None):
+        period = self.revenue_trend_var.get()
+        self._loading_label(self.revenue_canvas_frame, "Loading...")
+        self.worker.call(
+            self.load_revenue,
+            period,
+            on_done=lambda rows: self.draw_revenue_chart(period, rows),
+            owner=self,
+        )
+
+    @staticmethod
+    def load_revenue(db, period):
+        if period == "Daily (Last 30 Days)":
+            return db.get_daily_sales_trend(30)
+        if period == "Monthly (Last 12 Months)":
+            end = datetime.now()
+            start = end - timedelta(days=365)
+            return db.get_revenue_by_period(
+                "monthly",
+                date_range=[start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")],
+            )
+        return db.get_revenue_by_period(
+            "yearly",
+            date_range=["2000-01-01", datetime.now().strftime("%Y-%m-%d")],
+        )
+
+    def draw_revenue_chart(self, period, rows):
+        # A newer timeframe was picked while this one was loading.
+        if period != self.revenue_trend_var.get():
+            return
+
         c = self.colors
         for w in self.revenue_canvas_frame.winfo_children():
             w.destroy()
 
-        period = self.revenue_trend_var.get()
         fig = Figure(figsize=(6, 2.8), dpi=100)
         fig.patch.set_facecolor(c["surface"])
         ax = fig.add_subplot(111)
@@ -906,10 +999,10 @@ class Dashboard(tk.Frame):
 
         try:
             if period == "Daily (Last 30 Days)":
-                daily = self.db.get_daily_sales_trend(30)
+                daily = rows
                 if daily:
                     dates = [datetime.strptime(r[0], "%Y-%m-%d") for r in daily]
-                    revs = [r[2] for r in daily]
+                    revs = [r[2] / 100 for r in daily]
                     ax.plot(
                         dates,
                         revs,
@@ -923,15 +1016,10 @@ class Dashboard(tk.Frame):
                     data_found = True
 
             elif period == "Monthly (Last 12 Months)":
-                end = datetime.now()
-                start = end - timedelta(days=365)
-                raw = self.db.get_sales_data(
-                    date_range=[start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")]
-                )
-                agg = self._aggregate(raw, "monthly")
+                agg = rows
                 if agg:
                     dates = [datetime.strptime(d[0], "%Y-%m") for d in agg]
-                    revs = [d[1] for d in agg]
+                    revs = [d[2] / 100 for d in agg]
                     ax.plot(
                         dates,
                         revs,
@@ -945,13 +1033,10 @@ class Dashboard(tk.Frame):
                     data_found = True
 
             elif period == "Yearly (All Time)":
-                raw = self.db.get_sales_data(
-                    date_range=["2000-01-01", datetime.now().strftime("%Y-%m-%d")]
-                )
-                agg = self._aggregate(raw, "yearly")
+                agg = rows
                 if agg:
                     labels = [d[0] for d in agg]
-                    revs = [d[1] for d in agg]
+                    revs = [d[2] / 100 for d in agg]
                     bars = ax.bar(labels, revs, color=c["accent"], width=0.5)
                     for bar in bars:
                         h = bar.get_height()
@@ -996,26 +1081,12 @@ class Dashboard(tk.Frame):
         canvas.draw()
         canvas.get_tk_widget().pack(fill="both", expand=True)
 
-    def _aggregate(self, raw_data, period):
-        if not raw_data:
-            return []
-        fmt = "%Y-%m" if period == "monthly" else "%Y" if period == "yearly" else ""
-        if not fmt:
-            return []
-        agg = {}
-        for sale in raw_data:
-            try:
-                key = datetime.strptime(sale[6], "%Y-%m-%d").strftime(fmt)
-                agg[key] = agg.get(key, 0) + sale[5]
-            except (ValueError, TypeError, IndexError):
-                continue
-        return sorted(agg.items())
-
     # ── Category Chart ──────────────────────────────────────────
 
-    def create_category_chart(self, parent):
+    def create_category_chart(self, parent, cat_data):
         c = self.colors
-        cat_data = self.db.get_category_performance()
+        for w in parent.winfo_children():
+            w.destroy()
         if not cat_data:
             empty_img = self._keep(_load_tk_image("empty_plate.png", size=(80, 80)))
             empty_frame = tk.Frame(parent, bg=c["surface"])
@@ -1037,7 +1108,7 @@ class Dashboard(tk.Frame):
         ax.set_facecolor(c["surface"])
 
         categories = [r[0] for r in cat_data]
-        revenues = [r[3] for r in cat_data]
+        revenues = [r[3] / 100 for r in cat_data]
         palette = ["#3b82f6", "#059669", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899"]
         bars = ax.bar(categories, revenues, color=palette[: len(categories)], width=0.5)
 
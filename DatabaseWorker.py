@@ -0,0 +1,128 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+
+class DatabaseWorker:
+    """Runs RestaurantDatabaseManager calls on a dedicated thread.
+
+    The worker owns its own connection, so a slow query or a locked
+    database never blocks the Tk mainloop. submit() returns a Future;
+    call() additionally hands the result to a callback on the Tk thread,
+    by polling finished calls with after().
+    """
+
+    POLL_MS = 25
+
+    def __init__(
+        self, root, db_name="dinesight.db", profiler=None, sales_writer=None
+    ):
+        self.root = root
+        self.db_name = db_name
+        self.profiler = profiler
+        self.sales_writer = sales_writer
+        self._requests = queue.Queue()
+        self._finished = queue.Queue()
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._thread = threading.Thread(
+            target=self._run, name="DatabaseWorker", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+        self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def _run(self):
+        # Always release __init__, which re-raises a failed start-up there
+        # instead of leaving the window waiting forever.
+        db = None
+        try:
+            db = RestaurantDatabaseManager(self.db_name)
+            db.sales_writer = self.sales_writer
+            if self.profiler:
+                self.profiler.attach(db)
+        except BaseException as e:
+            self._startup_error = e
+            if db is not None:
+                db.close()
+            return
+        finally:
+            self._ready.set()
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    return
+                future, method, args, kwargs = request
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if callable(method):
+                        result = method(db, *args, **kwargs)
+                    else:
+                        result = getattr(db, method)(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            db.close()
+
+    def submit(self, method, *args, **kwargs):
+        """Queue a call and return its Future.
+
+        method is the name of a RestaurantDatabaseManager method, or a
+        function that takes the worker's manager as its first argument
+        (for several queries that belong together).
+        """
+        future = Future()
+        self._requests.put((future, method, args, kwargs))
+        return future
+
+    def call(self, method, *args, on_done=None, on_error=None, owner=None, **kwargs):
+        """submit(), then run on_done(result) or on_error(exc) on the Tk thread.
+
+        If owner is given and its widget has been destroyed by the time the
+        result arrives (the user switched pages), the callbacks are skipped.
+        """
+        future = self.submit(method, *args, **kwargs)
+        future.add_done_callback(
+            lambda f: self._finished.put((f, on_done, on_error, owner))
+        )
+        return future
+
+    def _poll(self):
+        while True:
+            try:
+                future, on_done, on_error, owner = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            if owner is not None and not owner.winfo_exists():
+                continue
+            try:
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is None:
+                    if on_done:
+                        on_done(future.result())
+                elif on_error:
+                    on_error(error)
+                else:
+                    print(f"Error in database call: {error}")
+            except Exception as e:
+                print(f"Error handling database result: {e}")
+        self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def close(self):
+        """Finish queued calls, then stop the thread and close its connection."""
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        if self._thread.is_alive():
+            self._requests.put(None)
+            self._thread.join()
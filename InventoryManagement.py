@@ -1,12 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from RestaurantDatabaseManager import RestaurantDatabaseManager
 
 
 class InventoryManagement(tk.Frame):
-    def __init__(self, parent, colors):
+    def __init__(self, parent, colors, db):
         super().__init__(parent, bg=colors['background'])
-        self.db = RestaurantDatabaseManager()
+        self.db = db
         self.colors = colors
         self.selected_item_id = None
         self.build_ui()
@@ -283,7 +282,6 @@ class InventoryManagement(tk.Frame):
         if messagebox.askyesno("Confirm", "Permanently delete this inventory item?"):
             if self.db.delete_inventory_item(self.selected_item_id):
                 messagebox.showinfo("Success", "Item deleted.")
-                self.db.check_and_update_all_menu_availability()
                 self.clear_form()
                 self.refresh_all_data()
             else:
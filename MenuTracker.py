@@ -2,13 +2,13 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 
 from RecipeEditor import RecipeEditorWindow
-from RestaurantDatabaseManager import RestaurantDatabaseManager
+from RestaurantDatabaseManager import format_money, to_cents
 
 
 class MenuTracker(tk.Frame):
-    def __init__(self, parent, colors):
+    def __init__(self, parent, colors, db):
         super().__init__(parent, bg=colors["background"])
-        self.db = RestaurantDatabaseManager()
+        self.db = db
         self.colors = colors
         self.selected_menu_item_id = None
         self.editing = False
@@ -200,7 +200,7 @@ class MenuTracker(tk.Frame):
             ("Total Items", str(total)),
             ("Available", str(available)),
             ("Categories", str(cats)),
-            ("Avg Price", f"${avg_price:.2f}"),
+            ("Avg Price", format_money(avg_price)),
             ("Most Popular", popular),
         ]
 
@@ -327,7 +327,7 @@ class MenuTracker(tk.Frame):
             self.menu_tree.insert(
                 "",
                 "end",
-                values=(item[0], item[1], item[2], f"${item[4]:.2f}", avail),
+                values=(item[0], item[1], item[2], format_money(item[4]), avail),
                 tags=tag,
             )
 
@@ -349,7 +349,7 @@ class MenuTracker(tk.Frame):
             self.menu_tree.insert(
                 "",
                 "end",
-                values=(item[0], item[1], item[2], f"${item[4]:.2f}", avail),
+                values=(item[0], item[1], item[2], format_money(item[4]), avail),
                 tags=tag,
             )
 
@@ -376,8 +376,8 @@ class MenuTracker(tk.Frame):
             messagebox.showerror("Error", "Name and Price are required.")
             return
         try:
-            price = float(price)
-            cost = float(self.cost_var.get()) if self.cost_var.get() else 0
+            price = to_cents(price)
+            cost = to_cents(self.cost_var.get()) if self.cost_var.get() else 0
             prep = int(self.prep_time_var.get()) if self.prep_time_var.get() else 0
         except ValueError:
             messagebox.showerror("Error", "Invalid numeric values.")
@@ -411,8 +411,8 @@ class MenuTracker(tk.Frame):
         self.name_var.set(item[1])
         self.category_var.set(item[2] or "Main Course")
         self.description_var.set(item[3] or "")
-        self.price_var.set(str(item[4]))
-        self.cost_var.set(str(item[5]) if item[5] else "")
+        self.price_var.set(f"{item[4] / 100:.2f}")
+        self.cost_var.set(f"{item[5] / 100:.2f}" if item[5] else "")
         self.prep_time_var.set(str(item[6]) if item[6] else "")
 
         # Show update/cancel, hide add
@@ -429,8 +429,8 @@ class MenuTracker(tk.Frame):
             messagebox.showerror("Error", "Name and Price are required.")
             return
         try:
-            price = float(price)
-            cost = float(self.cost_var.get()) if self.cost_var.get() else 0
+            price = to_cents(price)
+            cost = to_cents(self.cost_var.get()) if self.cost_var.get() else 0
             prep = int(self.prep_time_var.get()) if self.prep_time_var.get() else 0
         except ValueError:
             messagebox.showerror("Error", "Invalid numeric values.")
@@ -0,0 +1,354 @@
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import math
+import os
+import re
+import threading
+from datetime import datetime
+from time import perf_counter
+
+
+class QueryProfiler:
+    """Call counts, latency percentiles and row counts for a database manager.
+
+    attach(db) wraps every public RestaurantDatabaseManager method on that
+    instance and puts proxies in front of its connections, so each SQL
+    statement is timed from execute() until its last row is fetched.
+    Statements slower than slow_ms are written to a rotating log with their
+    parameters and EXPLAIN QUERY PLAN. Nothing is wrapped unless a profiler
+    is attached; see from_env().
+    """
+
+    def __init__(
+        self,
+        slow_ms=100,
+        log_path="slow_queries.log",
+        max_bytes=1_000_000,
+        backup_count=3,
+    ):
+        self.slow_seconds = slow_ms / 1000
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._queries = {}
+        self._retry_policies = []
+        self._log = logging.Logger("dinesight.slow_queries")
+        handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self._log.addHandler(handler)
+
+    @classmethod
+    def from_env(cls):
+        """A profiler if DINESIGHT_PROFILE is set, else None.
+
+        DINESIGHT_SLOW_MS sets the slow-query threshold (default 100).
+        """
+        if not os.environ.get("DINESIGHT_PROFILE"):
+            return None
+        return cls(slow_ms=float(os.environ.get("DINESIGHT_SLOW_MS", 100)))
+
+    # ── Attaching ───────────────────────────────────────────────
+
+    def attach(self, db):
+        if isinstance(db.conn, _ProfiledConnection):
+            return
+        for name, attr in vars(type(db)).items():
+            if name.startswith("_") or not inspect.isfunction(attr):
+                continue
+            setattr(db, name, self._wrap(name, getattr(db, name)))
+        if db.retry_policy not in self._retry_policies:
+            self._retry_policies.append(db.retry_policy)
+        shared = db.read_conn is db.conn
+        db.conn = _ProfiledConnection(db.conn, self)
+        db.read_conn = db.conn if shared else _ProfiledConnection(db.read_conn, self)
+        db.cursor = db.conn.cursor()
+
+    def detach(self, db):
+        if not isinstance(db.conn, _ProfiledConnection):
+            return
+        for name, value in list(vars(db).items()):
+            if hasattr(value, "__wrapped__"):
+                delattr(db, name)
+        shared = db.read_conn is db.conn
+        db.conn = db.conn.raw
+        db.read_conn = db.conn if shared else db.read_conn.raw
+        db.cursor = db.conn.cursor()
+
+    def _wrap(self, name, method):
+        if inspect.isgeneratorfunction(method):
+
+            @functools.wraps(method)
+            def generator_wrapper(*args, **kwargs):
+                # Only time spent inside the generator counts, not the
+                # caller's work between items.
+                items = method(*args, **kwargs)
+                elapsed = 0.0
+                count = 0
+                try:
+                    while True:
+                        start = perf_counter()
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += perf_counter() - start
+                        count += 1
+                        yield item
+                finally:
+                    items.close()
+                    self.record_method(name, elapsed, count)
+
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            rows = len(result) if isinstance(result, (list, tuple)) else None
+            self.record_method(name, perf_counter() - start, rows)
+            return result
+
+        return wrapper
+
+    # ── Recording ───────────────────────────────────────────────
+
+    def record_method(self, name, seconds, rows=None):
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = _Stats()
+            stats.add(seconds, rows)
+
+    def on_execute(self, conn, sql, params):
+        """Called as each statement starts, before it runs; for subclasses."""
+
+    def record_query(self, conn, sql, params, seconds, rows):
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._queries.get(key)
+            if stats is None:
+                stats = self._queries[key] = _Stats()
+            stats.add(seconds, rows)
+        if seconds >= self.slow_seconds:
+            self._log_slow_query(conn, sql, params, seconds, rows)
+
+    def _log_slow_query(self, conn, sql, params, seconds, rows):
+        try:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            plan = "\n".join("  " + row[3] for row in plan) or "  (no plan)"
+        except Exception as e:
+            # e.g. the statement used an archive that is no longer attached
+            plan = f"  (unavailable: {e})"
+        self._log.warning(
+            "%.1f ms, %s rows, %s\n%s\nparams: %r\nplan:\n%s\n",
+            seconds * 1000,
+            "?" if rows is None else rows,
+            threading.current_thread().name,
+            " ".join(sql.split()),
+            params,
+            plan,
+        )
+
+    # ── Reporting ───────────────────────────────────────────────
+
+    def stats(self):
+        """Returns: dict of methods and queries, slowest total time first,
+        plus the retry metrics of the attached managers' retry policies."""
+        retries = {}
+        for policy in self._retry_policies:
+            for name, counts in policy.stats().items():
+                total = retries.setdefault(name, dict.fromkeys(counts, 0))
+                for key, value in counts.items():
+                    if key == "max_wait_ms":
+                        total[key] = max(total[key], value)
+                    else:
+                        total[key] = round(total[key] + value, 3)
+        with self._lock:
+            return {
+                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "slow_ms": self.slow_seconds * 1000,
+                "methods": _report(self._methods),
+                "queries": _report(self._queries),
+                "retries": retries,
+            }
+
+    def export_json(self, path="query_profile.json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, indent=2)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._queries.clear()
+        for policy in self._retry_policies:
+            policy.reset()
+
+
+class _Stats:
+    """Count, rows and a log-scale latency histogram with ~10% wide buckets."""
+
+    BASE = 1.1
+
+    __slots__ = ("count", "seconds", "max", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.buckets = {}
+
+    def add(self, seconds, rows=None):
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        if rows:
+            self.rows += rows
+        # Bucket b holds latencies up to BASE**b microseconds.
+        bucket = max(0, math.ceil(math.log(max(seconds * 1e6, 1), self.BASE)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.BASE**bucket / 1e6, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.seconds * 1000, 3),
+            "mean_ms": round(self.seconds * 1000 / self.count, 3),
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+def _report(table):
+    ranked = sorted(table.items(), key=lambda item: item[1].seconds, reverse=True)
+    return {name: stats.as_dict() for name, stats in ranked}
+
+
+def normalize_sql(sql):
+    # One entry per statement shape: archive schema names are numbered per
+    # attach, and whitespace differs between call sites.
+    return re.sub(r"\barchive_\d+\b", "archive_N", " ".join(sql.split()))
+
+
+class _ProfiledConnection:
+    """Stands in for a sqlite3.Connection; everything but cursors passes through."""
+
+    def __init__(self, conn, profiler):
+        self.raw = conn
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self):
+        return _ProfiledCursor(self.raw.cursor(), self.raw, self._profiler)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class _ProfiledCursor:
+    """Times a statement from execute() until its rows are exhausted.
+
+    A statement whose rows are not all fetched is recorded when the cursor
+    runs its next statement or is closed.
+    """
+
+    def __init__(self, cursor, conn, profiler):
+        self._cursor = cursor
+        self._conn = conn
+        self._profiler = profiler
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = perf_counter()
+        try:
+            row = next(self._cursor)
+        except StopIteration:
+            self._fetched(perf_counter() - start, 0, done=True)
+            raise
+        self._fetched(perf_counter() - start, 1)
+        return row
+
+    def __del__(self):
+        self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._profiler.on_execute(self._conn, sql, parameters)
+        start = perf_counter()
+        self._cursor.execute(sql, parameters)
+        self._pending = [sql, parameters, perf_counter() - start, 0]
+        if self._cursor.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._profiler.on_execute(self._conn, sql, None)
+        start = perf_counter()
+        self._cursor.executemany(sql, seq_of_parameters)
+        self._profiler.record_query(
+            self._conn, sql, (), perf_counter() - start, self._cursor.rowcount
+        )
+        return self
+
+    def fetchone(self):
+        start = perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(perf_counter() - start, row is not None, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = perf_counter()
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        self._fetched(perf_counter() - start, len(rows), done=not rows)
+        return rows
+
+    def fetchall(self):
+        start = perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(perf_counter() - start, len(rows), done=True)
+        return rows
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def _fetched(self, seconds, rows, done=False):
+        if self._pending is not None:
+            self._pending[2] += seconds
+            self._pending[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._profiler.record_query(self._conn, *pending)
@@ -1,14 +1,773 @@
+import itertools
 import sqlite3
-from datetime import datetime
+import time
+import uuid
+from contextlib import closing, contextmanager, nullcontext
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from RetryPolicy import RetryPolicy
+
+
+# ── Rollups ──────────────────────────────────────────────────
+#
+# Rollups keep running totals so dashboard queries scale with the number of
+# days (or items), not the number of sales: orders per day, each menu
+# item per day and per hour, plus an all-time counter per item. They are
+# maintained by the triggers below and can be rebuilt from scratch with
+# rebuild_sales_rollups (or `python db_admin.py rebuild-rollups`).
+
+SALES_TRIGGERS = {
+    "trg_orders_rollup": """
+        CREATE TRIGGER trg_orders_rollup AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO orders_daily (order_date, orders, items_sold, revenue)
+            VALUES (NEW.order_date, 1, NEW.items_sold, NEW.total_amount)
+            ON CONFLICT (order_date) DO UPDATE SET
+                orders = orders + 1,
+                items_sold = items_sold + excluded.items_sold,
+                revenue = revenue + excluded.revenue;
+        END
+    """,
+    "trg_order_lines_rollup": """
+        CREATE TRIGGER trg_order_lines_rollup AFTER INSERT ON order_lines
+        BEGIN
+            INSERT INTO sales_daily (order_date, menu_item_id, orders, items_sold, revenue)
+            SELECT order_date, NEW.menu_item_id, 1, NEW.quantity, NEW.total_amount
+            FROM orders WHERE id = NEW.order_id
+            ON CONFLICT (order_date, menu_item_id) DO UPDATE SET
+                orders = orders + 1,
+                items_sold = items_sold + excluded.items_sold,
+                revenue = revenue + excluded.revenue;
+
+            INSERT INTO sales_hourly
+                (order_date, hour, menu_item_id, orders, items_sold, revenue)
+            SELECT order_date, order_hour, NEW.menu_item_id,
+                   1, NEW.quantity, NEW.total_amount
+            FROM orders WHERE id = NEW.order_id
+            ON CONFLICT (order_date, hour, menu_item_id) DO UPDATE SET
+                orders = orders + 1,
+                items_sold = items_sold + excluded.items_sold,
+                revenue = revenue + excluded.revenue;
+
+            INSERT INTO item_sales_totals (menu_item_id, items_sold, revenue)
+            VALUES (NEW.menu_item_id, NEW.quantity, NEW.total_amount)
+            ON CONFLICT (menu_item_id) DO UPDATE SET
+                items_sold = items_sold + excluded.items_sold,
+                revenue = revenue + excluded.revenue;
+        END
+    """,
+}
+
+
+def _install_sales_triggers(cursor):
+    for name, sql in SALES_TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(sql)
+
+
+def _rebuild_sales_rollups(cursor):
+    # Archived years are closed: their rollup rows are kept as they are
+    # (late orders back-dated into them were counted by the triggers) and
+    # only the days after the last archived year are recomputed.
+    cursor.execute("SELECT MAX(year) FROM archives")
+    last_archived = cursor.fetchone()[0]
+    cutoff = f"{last_archived + 1:04d}-01-01" if last_archived else ""
+    cursor.execute("DELETE FROM orders_daily WHERE order_date >= ?", (cutoff,))
+    cursor.execute("DELETE FROM sales_daily WHERE order_date >= ?", (cutoff,))
+    cursor.execute("DELETE FROM sales_hourly WHERE order_date >= ?", (cutoff,))
+    cursor.execute("DELETE FROM item_sales_totals")
+    cursor.execute(
+        """
+        INSERT INTO orders_daily (order_date, orders, items_sold, revenue)
+        SELECT order_date, COUNT(*), SUM(items_sold), SUM(total_amount)
+        FROM orders
+        WHERE order_date >= ?
+        GROUP BY order_date
+    """,
+        (cutoff,),
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily (order_date, menu_item_id, orders, items_sold, revenue)
+        SELECT o.order_date, l.menu_item_id,
+               COUNT(*), SUM(l.quantity), SUM(l.total_amount)
+        FROM order_lines l
+        JOIN orders o ON o.id = l.order_id
+        WHERE o.order_date >= ?
+        GROUP BY 1, 2
+    """,
+        (cutoff,),
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_hourly
+            (order_date, hour, menu_item_id, orders, items_sold, revenue)
+        SELECT o.order_date, o.order_hour, l.menu_item_id,
+               COUNT(*), SUM(l.quantity), SUM(l.total_amount)
+        FROM order_lines l
+        JOIN orders o ON o.id = l.order_id
+        WHERE o.order_date >= ?
+        GROUP BY 1, 2, 3
+    """,
+        (cutoff,),
+    )
+    cursor.execute("""
+        INSERT INTO item_sales_totals (menu_item_id, items_sold, revenue)
+        SELECT menu_item_id, SUM(items_sold), SUM(revenue)
+        FROM sales_daily
+        GROUP BY menu_item_id
+    """)
+
+
+# ── Schema migrations ───────────────────────────────────────────
+#
+# Each migration upgrades the schema by one step and is recorded in
+# PRAGMA user_version, so existing dinesight.db files are upgraded in
+# place the next time they are opened. Append new steps; never edit
+# one that has already shipped. Steps only change tables and indexes:
+# after any step runs, the current SALES_TRIGGERS are reinstalled, and if
+# a step returns True the rollups are rebuilt from the migrated data.
+
+
+def _migration_1_indexes(cursor):
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sales_order_date_time "
+        "ON sales (order_date, order_time)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sales_category "
+        "ON sales (category, quantity, total_amount)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sales_item_name "
+        "ON sales (item_name, quantity)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recipes_menu_item "
+        "ON recipes (menu_item_id, ingredient_id, quantity_used)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recipes_ingredient "
+        "ON recipes (ingredient_id, menu_item_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_inventory_stock "
+        "ON inventory (current_stock, minimum_threshold)"
+    )
+
+
+def _migration_2_sales_rollups(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            order_date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (order_date, category, item_name)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_hourly (
+            order_date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (order_date, hour, category, item_name)
+        ) WITHOUT ROWID
+    """)
+    return True
+
+
+def _migration_3_item_sales_totals(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_sales_totals (
+            item_name TEXT PRIMARY KEY,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_item_sales_totals_sold "
+        "ON item_sales_totals (items_sold)"
+    )
+    return True
+
+
+# Legacy-compatible row shape for the normalized order tables: the first
+# eleven columns match the old sales table, so positional callers keep
+# working; order_id and menu_item_id are appended.
+_SALES_VIEW = """
+    CREATE VIEW sales AS
+    SELECT l.id, m.name AS item_name, m.category, l.quantity, l.unit_price,
+           l.total_amount, o.order_date, o.order_time,
+           CASE CAST(strftime('%w', o.order_date) AS INTEGER)
+               WHEN 0 THEN 'Sunday' WHEN 1 THEN 'Monday' WHEN 2 THEN 'Tuesday'
+               WHEN 3 THEN 'Wednesday' WHEN 4 THEN 'Thursday'
+               WHEN 5 THEN 'Friday' WHEN 6 THEN 'Saturday'
+           END AS day_of_week,
+           CASE substr(o.order_date, 6, 2)
+               WHEN '01' THEN 'January' WHEN '02' THEN 'February'
+               WHEN '03' THEN 'March' WHEN '04' THEN 'April' WHEN '05' THEN 'May'
+               WHEN '06' THEN 'June' WHEN '07' THEN 'July' WHEN '08' THEN 'August'
+               WHEN '09' THEN 'September' WHEN '10' THEN 'October'
+               WHEN '11' THEN 'November' WHEN '12' THEN 'December'
+           END AS month,
+           CAST(substr(o.order_date, 1, 4) AS INTEGER) AS year,
+           l.order_id, l.menu_item_id
+    FROM order_lines l
+    JOIN orders o ON o.id = l.order_id
+    JOIN menu_items m ON m.id = l.menu_item_id
+"""
+
+
+def _migration_4_orders(cursor):
+    # Menu items that have sales history are retired instead of deleted,
+    # so order lines can always reference them by id.
+    cursor.execute(
+        "ALTER TABLE menu_items ADD COLUMN is_retired INTEGER NOT NULL DEFAULT 0"
+    )
+    cursor.execute("""
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_date TEXT NOT NULL,
+            order_time TEXT NOT NULL,
+            line_count INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            total_amount REAL NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX idx_orders_date_time ON orders (order_date, order_time)"
+    )
+    cursor.execute("""
+        CREATE TABLE order_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+            menu_item_id INTEGER NOT NULL REFERENCES menu_items (id),
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            total_amount REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_order_lines_order ON order_lines (order_id)")
+    cursor.execute(
+        "CREATE INDEX idx_order_lines_menu_item "
+        "ON order_lines (menu_item_id, quantity, total_amount)"
+    )
+
+    # Sold items that are no longer on the menu become retired menu items.
+    cursor.execute("""
+        INSERT INTO menu_items
+            (name, category, price, is_available, created_date, last_updated,
+             is_retired)
+        SELECT IFNULL(item_name, 'Unknown item'), MAX(category),
+               IFNULL(MAX(unit_price), 0), 0, MIN(order_date), MAX(order_date), 1
+        FROM sales
+        WHERE IFNULL(item_name, 'Unknown item') NOT IN (SELECT name FROM menu_items)
+        GROUP BY 1
+    """)
+    cursor.execute("""
+        CREATE TEMP TABLE legacy_item_ids AS
+        SELECT name, MIN(id) AS menu_item_id FROM menu_items GROUP BY name
+    """)
+
+    # The old table has no order grouping; lines recorded at the same
+    # second were rung up together, so they become one order.
+    cursor.execute("""
+        INSERT INTO orders (order_date, order_time, line_count, items_sold, total_amount)
+        SELECT IFNULL(order_date, '1970-01-01'), IFNULL(order_time, '00:00:00'),
+               COUNT(*), IFNULL(SUM(quantity), 0), IFNULL(SUM(total_amount), 0)
+        FROM sales
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO order_lines
+            (id, order_id, menu_item_id, quantity, unit_price, total_amount)
+        SELECT s.id, o.id, k.menu_item_id, IFNULL(s.quantity, 0),
+               IFNULL(s.unit_price, 0), IFNULL(s.total_amount, 0)
+        FROM sales s
+        JOIN orders o
+          ON o.order_date = IFNULL(s.order_date, '1970-01-01')
+         AND o.order_time = IFNULL(s.order_time, '00:00:00')
+        JOIN legacy_item_ids k ON k.name = IFNULL(s.item_name, 'Unknown item')
+        ORDER BY s.id
+    """)
+    cursor.execute("DROP TABLE legacy_item_ids")
+
+    cursor.execute("DROP TABLE sales")
+    cursor.execute(_SALES_VIEW)
+
+    # Rollups are re-keyed by menu_item_id and gain a per-day order total.
+    cursor.execute("DROP TABLE sales_daily")
+    cursor.execute("DROP TABLE sales_hourly")
+    cursor.execute("DROP TABLE item_sales_totals")
+    cursor.execute("""
+        CREATE TABLE orders_daily (
+            order_date TEXT PRIMARY KEY,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE sales_daily (
+            order_date TEXT NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (order_date, menu_item_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE sales_hourly (
+            order_date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (order_date, hour, menu_item_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE item_sales_totals (
+            menu_item_id INTEGER PRIMARY KEY,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX idx_item_sales_totals_sold ON item_sales_totals (items_sold)"
+    )
+    return True
+
+
+_SALES_VIEW_5 = """
+    CREATE VIEW sales AS
+    SELECT l.id, m.name AS item_name, m.category, l.quantity, l.unit_price,
+           l.total_amount, o.order_date, o.order_time,
+           CASE o.order_weekday
+               WHEN 1 THEN 'Monday' WHEN 2 THEN 'Tuesday' WHEN 3 THEN 'Wednesday'
+               WHEN 4 THEN 'Thursday' WHEN 5 THEN 'Friday'
+               WHEN 6 THEN 'Saturday' WHEN 7 THEN 'Sunday'
+           END AS day_of_week,
+           CASE substr(o.year_month, 6, 2)
+               WHEN '01' THEN 'January' WHEN '02' THEN 'February'
+               WHEN '03' THEN 'March' WHEN '04' THEN 'April' WHEN '05' THEN 'May'
+               WHEN '06' THEN 'June' WHEN '07' THEN 'July' WHEN '08' THEN 'August'
+               WHEN '09' THEN 'September' WHEN '10' THEN 'October'
+               WHEN '11' THEN 'November' WHEN '12' THEN 'December'
+           END AS month,
+           CAST(substr(o.year_month, 1, 4) AS INTEGER) AS year,
+           l.order_id, l.menu_item_id, o.order_ts
+    FROM order_lines l
+    JOIN orders o ON o.id = l.order_id
+    JOIN menu_items m ON m.id = l.menu_item_id
+"""
+
+
+def _migration_5_order_timestamps(cursor):
+    # orders is keyed on an integer timestamp; date, time and the time
+    # buckets are STORED generated columns so they can be indexed.
+    # order_ts is local wall-clock time counted as if it were UTC, so the
+    # 'unixepoch' date functions give back the local date and time.
+    cursor.execute("DROP VIEW sales")
+    for name in SALES_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("""
+        CREATE TABLE orders_v5 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_ts INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            order_date TEXT GENERATED ALWAYS AS (date(order_ts, 'unixepoch')) STORED,
+            order_time TEXT GENERATED ALWAYS AS (time(order_ts, 'unixepoch')) STORED,
+            order_hour INTEGER GENERATED ALWAYS AS (order_ts % 86400 / 3600) STORED,
+            -- ISO weekday, 1 = Monday; 1970-01-01 was a Thursday
+            order_weekday INTEGER GENERATED ALWAYS AS ((order_ts / 86400 + 3) % 7 + 1) STORED,
+            year_month TEXT GENERATED ALWAYS AS
+                (strftime('%Y-%m', order_ts, 'unixepoch')) STORED
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO orders_v5 (id, order_ts, line_count, items_sold, total_amount)
+        SELECT id,
+               CAST(COALESCE(strftime('%s', order_date || ' ' || order_time),
+                             strftime('%s', order_date), 0) AS INTEGER),
+               line_count, items_sold, total_amount
+        FROM orders
+        ORDER BY id
+    """)
+    cursor.execute("DROP TABLE orders")
+    cursor.execute("ALTER TABLE orders_v5 RENAME TO orders")
+    cursor.execute("CREATE INDEX idx_orders_ts ON orders (order_ts)")
+    cursor.execute(
+        "CREATE INDEX idx_orders_hour ON orders (order_hour, total_amount)"
+    )
+    cursor.execute(
+        "CREATE INDEX idx_orders_weekday ON orders (order_weekday, total_amount)"
+    )
+    cursor.execute(
+        "CREATE INDEX idx_orders_year_month ON orders (year_month, total_amount)"
+    )
+    cursor.execute(_SALES_VIEW_5)
+
+
+def _migration_6_money_cents(cursor):
+    # Money moves from REAL dollars to INTEGER cents. Column types cannot
+    # be altered in place, so each table holding prices or totals is
+    # rebuilt. inventory.cost_per_unit stays REAL: unit costs of bulk
+    # ingredients are routinely fractions of a cent.
+    cursor.execute("DROP VIEW sales")
+    for name in SALES_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    cursor.execute("""
+        CREATE TABLE menu_items_v6 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT,
+            description TEXT,
+            price INTEGER NOT NULL,
+            cost INTEGER,
+            preparation_time INTEGER,
+            is_available BOOLEAN DEFAULT 1,
+            created_date TEXT,
+            last_updated TEXT,
+            is_retired INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO menu_items_v6
+        SELECT id, name, category, description,
+               CAST(ROUND(price * 100) AS INTEGER),
+               CAST(ROUND(cost * 100) AS INTEGER),
+               preparation_time, is_available, created_date, last_updated,
+               is_retired
+        FROM menu_items
+        ORDER BY id
+    """)
+    cursor.execute("DROP TABLE menu_items")
+    cursor.execute("ALTER TABLE menu_items_v6 RENAME TO menu_items")
+
+    cursor.execute("""
+        CREATE TABLE order_lines_v6 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+            menu_item_id INTEGER NOT NULL REFERENCES menu_items (id),
+            quantity INTEGER NOT NULL,
+            unit_price INTEGER NOT NULL,
+            total_amount INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO order_lines_v6
+        SELECT id, order_id, menu_item_id, quantity,
+               CAST(ROUND(unit_price * 100) AS INTEGER),
+               CAST(ROUND(total_amount * 100) AS INTEGER)
+        FROM order_lines
+        ORDER BY id
+    """)
+    cursor.execute("DROP TABLE order_lines")
+    cursor.execute("ALTER TABLE order_lines_v6 RENAME TO order_lines")
+    cursor.execute("CREATE INDEX idx_order_lines_order ON order_lines (order_id)")
+    cursor.execute(
+        "CREATE INDEX idx_order_lines_menu_item "
+        "ON order_lines (menu_item_id, quantity, total_amount)"
+    )
+
+    cursor.execute("""
+        CREATE TABLE orders_v6 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_ts INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            total_amount INTEGER NOT NULL,
+            order_date TEXT GENERATED ALWAYS AS (date(order_ts, 'unixepoch')) STORED,
+            order_time TEXT GENERATED ALWAYS AS (time(order_ts, 'unixepoch')) STORED,
+            order_hour INTEGER GENERATED ALWAYS AS (order_ts % 86400 / 3600) STORED,
+            -- ISO weekday, 1 = Monday; 1970-01-01 was a Thursday
+            order_weekday INTEGER GENERATED ALWAYS AS ((order_ts / 86400 + 3) % 7 + 1) STORED,
+            year_month TEXT GENERATED ALWAYS AS
+                (strftime('%Y-%m', order_ts, 'unixepoch')) STORED
+        )
+    """)
+    # Order totals are re-derived from their rounded lines so that the
+    # order and line rollups reconcile to the cent.
+    cursor.execute("""
+        INSERT INTO orders_v6 (id, order_ts, line_count, items_sold, total_amount)
+        SELECT o.id, o.order_ts, o.line_count, o.items_sold,
+               COALESCE(
+                   (SELECT SUM(total_amount) FROM order_lines WHERE order_id = o.id),
+                   CAST(ROUND(o.total_amount * 100) AS INTEGER)
+               )
+        FROM orders o
+        ORDER BY o.id
+    """)
+    cursor.execute("DROP TABLE orders")
+    cursor.execute("ALTER TABLE orders_v6 RENAME TO orders")
+    cursor.execute("CREATE INDEX idx_orders_ts ON orders (order_ts)")
+    cursor.execute(
+        "CREATE INDEX idx_orders_hour ON orders (order_hour, total_amount)"
+    )
+    cursor.execute(
+        "CREATE INDEX idx_orders_weekday ON orders (order_weekday, total_amount)"
+    )
+    cursor.execute(
+        "CREATE INDEX idx_orders_year_month ON orders (year_month, total_amount)"
+    )
+    cursor.execute(_SALES_VIEW_5)
+
+    # Rollups only need their revenue columns retyped; they are rebuilt.
+    cursor.execute("DROP TABLE orders_daily")
+    cursor.execute("DROP TABLE sales_daily")
+    cursor.execute("DROP TABLE sales_hourly")
+    cursor.execute("""
+        CREATE TABLE orders_daily (
+            order_date TEXT PRIMARY KEY,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE sales_daily (
+            order_date TEXT NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue INTEGER NOT NULL,
+            PRIMARY KEY (order_date, menu_item_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE sales_hourly (
+            order_date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            orders INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue INTEGER NOT NULL,
+            PRIMARY KEY (order_date, hour, menu_item_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("DROP TABLE item_sales_totals")
+    cursor.execute("""
+        CREATE TABLE item_sales_totals (
+            menu_item_id INTEGER PRIMARY KEY,
+            items_sold INTEGER NOT NULL,
+            revenue INTEGER NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX idx_item_sales_totals_sold ON item_sales_totals (items_sold)"
+    )
+    return True
+
+
+def _migration_7_archives(cursor):
+    # Catalogue of closed years moved out to dinesight_YYYY.db files.
+    cursor.execute("""
+        CREATE TABLE archives (
+            year INTEGER PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            orders INTEGER NOT NULL,
+            order_lines INTEGER NOT NULL,
+            revenue INTEGER NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+    """)
+
+
+def _migration_8_order_refs(cursor):
+    # A reference chosen by whoever records the order, so a checkout that
+    # is retried is recognised instead of recorded twice. Imported and
+    # older orders have none.
+    cursor.execute("ALTER TABLE orders ADD COLUMN order_ref TEXT")
+    cursor.execute(
+        "CREATE UNIQUE INDEX idx_orders_ref ON orders (order_ref) "
+        "WHERE order_ref IS NOT NULL"
+    )
+
+
+def _migration_9_drop_bucket_indexes(cursor):
+    # Hourly, weekday and monthly figures come from the rollups, so no
+    # query reads these; they only cost every checkout three index writes.
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_hour")
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_weekday")
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_year_month")
+
+
+MIGRATIONS = [
+    _migration_1_indexes,
+    _migration_2_sales_rollups,
+    _migration_3_item_sales_totals,
+    _migration_4_orders,
+    _migration_5_order_timestamps,
+    _migration_6_money_cents,
+    _migration_7_archives,
+    _migration_8_order_refs,
+    _migration_9_drop_bucket_indexes,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# ── Archives ───────────────────────────────────────────────
+#
+# Closed years can be moved out of the hot database into one file per
+# year (dinesight_2021.db next to dinesight.db), listed in the archives
+# table. The rollups keep every archived day, so summaries and all-time
+# charts never open an archive; row-level readers attach one archive at a
+# time, read-only, when their date range reaches it.
+
+_ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS archive.orders (
+        id INTEGER PRIMARY KEY,
+        order_ts INTEGER NOT NULL,
+        line_count INTEGER NOT NULL,
+        items_sold INTEGER NOT NULL,
+        total_amount INTEGER NOT NULL,
+        order_date TEXT GENERATED ALWAYS AS (date(order_ts, 'unixepoch')) STORED,
+        order_time TEXT GENERATED ALWAYS AS (time(order_ts, 'unixepoch')) STORED,
+        order_hour INTEGER GENERATED ALWAYS AS (order_ts % 86400 / 3600) STORED,
+        order_weekday INTEGER GENERATED ALWAYS AS ((order_ts / 86400 + 3) % 7 + 1) STORED,
+        year_month TEXT GENERATED ALWAYS AS
+            (strftime('%Y-%m', order_ts, 'unixepoch')) STORED
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_orders_ts ON orders (order_ts)",
+    """
+    CREATE TABLE IF NOT EXISTS archive.order_lines (
+        id INTEGER PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        menu_item_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price INTEGER NOT NULL,
+        total_amount INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_order_lines_order ON order_lines (order_id)",
+    f"PRAGMA archive.user_version = {len(MIGRATIONS)}",
+)
+
+
+def _archive_sales_select(schema):
+    """The sales view's SELECT, reading orders and lines from `schema`."""
+    select = _SALES_VIEW_5.replace("CREATE VIEW sales AS", "")
+    select = select.replace("FROM order_lines l", f"FROM {schema}.order_lines l")
+    select = select.replace("JOIN orders o", f"JOIN {schema}.orders o")
+    return select.replace("JOIN menu_items m", "JOIN main.menu_items m")
+
+
+# ── Money ──────────────────────────────────────────────────
+#
+# Prices, costs and totals are stored and summed as integer cents; only
+# the UI converts, parsing input with to_cents and displaying with
+# format_money.
+
+
+def to_cents(amount):
+    """Dollars (a number or a string such as "12.50") to integer cents."""
+    try:
+        cents = Decimal(str(amount).strip().lstrip("$")) * 100
+        return int(cents.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Not a money amount: {amount!r}") from None
+
+
+def format_money(cents, thousands=False):
+    """Integer cents as "$12.50" (or "$1,234.50" with thousands=True)."""
+    cents = int(round(cents or 0))
+    sign = "-" if cents < 0 else ""
+    dollars, cents = divmod(abs(cents), 100)
+    dollars = f"{dollars:,}" if thousands else str(dollars)
+    return f"{sign}${dollars}.{cents:02d}"
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _order_ts(moment):
+    """orders.order_ts for a local datetime, or for midnight of a date."""
+    if not isinstance(moment, datetime):
+        moment = datetime.combine(moment, datetime.min.time())
+    return int((moment.replace(tzinfo=None) - _EPOCH).total_seconds())
+
+
+class InsufficientStockError(Exception):
+    def __init__(self, ingredient_id):
+        super().__init__(f"not enough stock of ingredient {ingredient_id}")
+        self.ingredient_id = ingredient_id
 
 
 class RestaurantDatabaseManager:
-    def __init__(self, db_name="dinesight.db"):
+    # Applied once per connection. WAL lets readers run alongside the POS
+    # writer; NORMAL sync is durable across app crashes in WAL mode.
+    PRAGMAS = (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -16384),  # KiB, i.e. 16 MB
+        ("mmap_size", 128 * 1024 * 1024),
+        ("temp_store", "MEMORY"),
+        ("busy_timeout", 5000),  # ms
+    )
+
+    def __init__(self, db_name="dinesight.db", retry_policy=None):
+        self.db_name = db_name
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Optional SalesWriter that checkout_order hands orders to.
+        self.sales_writer = None
+        # Exception behind the last failed record_order or checkout_order,
+        # for callers that need to tell a short order from a locked database.
+        self.last_error = None
         self.conn = sqlite3.connect(db_name, check_same_thread=False)
         self.cursor = self.conn.cursor()
+        for pragma, value in self.PRAGMAS:
+            self.cursor.execute(f"PRAGMA {pragma} = {value}")
         self.create_tables()
+        self.read_conn = self._connect_read_only()
+
+    def _connect_read_only(self):
+        """Second, read-only connection for the analytics get_* methods.
+
+        Reports then never share a cursor or a transaction with the POS
+        writes on self.conn; in WAL mode they read a committed snapshot
+        without blocking checkouts. Each query runs on its own cursor.
+        """
+        if self.db_name == ":memory:":
+            return self.conn
+        uri = Path(self.db_name).resolve().as_uri() + "?mode=ro"
+        # Autocommit: never let an implicit BEGIN pin an old snapshot.
+        conn = sqlite3.connect(
+            uri, uri=True, check_same_thread=False, isolation_level=None
+        )
+        for pragma, value in self.PRAGMAS:
+            if pragma != "journal_mode":
+                conn.execute(f"PRAGMA {pragma} = {value}")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
 
     def create_tables(self):
+        # Baseline (schema v0) tables; every later change is a migration.
+        if self.get_schema_version() == 0:
+            self._create_baseline_tables()
+        self.migrate()
+        self.repair_sales_triggers()
+        self.check_and_update_all_menu_availability()
+
+    def _create_baseline_tables(self):
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS menu_items (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,7 +835,70 @@ class RestaurantDatabaseManager:
         """)
 
         self.conn.commit()
-        self.check_and_update_all_menu_availability()
+
+    def get_schema_version(self):
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
+
+    def migrate(self):
+        """Apply any pending MIGRATIONS, one transaction per step."""
+        version = self.get_schema_version()
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema v{version} is newer than this build "
+                f"(v{SCHEMA_VERSION})"
+            )
+        if version == SCHEMA_VERSION:
+            return
+        rebuild_rollups = False
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            try:
+                self.cursor.execute("BEGIN")
+                rebuild_rollups |= bool(migration(self.cursor))
+                self.cursor.execute(f"PRAGMA user_version = {target}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+        self.cursor.execute("BEGIN")
+        _install_sales_triggers(self.cursor)
+        if rebuild_rollups:
+            _rebuild_sales_rollups(self.cursor)
+        self.conn.commit()
+
+        # Steps that rebuild or drop tables leave their old pages on the
+        # freelist; give them back to the filesystem once, after upgrading.
+        self.cursor.execute("PRAGMA freelist_count")
+        free_pages = self.cursor.fetchone()[0]
+        self.cursor.execute("PRAGMA page_count")
+        if free_pages * 4 > self.cursor.fetchone()[0]:
+            self.cursor.execute("VACUUM")
+
+    def repair_sales_triggers(self):
+        """Reinstall missing rollup triggers and rebuild the rollups.
+
+        import_sales drops the triggers while it loads; if it is killed
+        before putting them back, sales would silently stop reaching the
+        rollups. Returns: True if anything had to be repaired.
+        """
+        placeholders = ", ".join("?" * len(SALES_TRIGGERS))
+        self.cursor.execute(
+            f"SELECT COUNT(*) FROM sqlite_master "
+            f"WHERE type = 'trigger' AND name IN ({placeholders})",
+            tuple(SALES_TRIGGERS),
+        )
+        if self.cursor.fetchone()[0] == len(SALES_TRIGGERS):
+            return False
+        try:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            _install_sales_triggers(self.cursor)
+            _rebuild_sales_rollups(self.cursor)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return True
 
     # ── Inventory ───────────────────────────────────────────────
 
@@ -112,7 +934,7 @@ class RestaurantDatabaseManager:
                 ),
             )
             self.conn.commit()
-            self.check_and_update_all_menu_availability()
+            self.update_menu_availability_for_ingredients([self.cursor.lastrowid])
             return True
         except Exception as e:
             print(f"Error adding inventory item: {e}")
@@ -150,7 +972,7 @@ class RestaurantDatabaseManager:
                 ),
             )
             self.conn.commit()
-            self.check_and_update_all_menu_availability()
+            self.update_menu_availability_for_ingredients([item_id])
             return True
         except Exception as e:
             print(f"Error updating inventory item: {e}")
@@ -158,7 +980,9 @@ class RestaurantDatabaseManager:
 
     def delete_inventory_item(self, item_id):
         try:
+            affected = self.get_menu_items_using_ingredients([item_id])
             self.cursor.execute("DELETE FROM inventory WHERE id=?", (item_id,))
+            self._refresh_menu_availability(affected)
             self.conn.commit()
             return True
         except Exception as e:
@@ -192,6 +1016,7 @@ class RestaurantDatabaseManager:
     def add_menu_item(
         self, name, category, description, price, cost, prep_time, is_available=True
     ):
+        """price and cost are integer cents (see to_cents)."""
         try:
             now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             self.cursor.execute(
@@ -221,9 +1046,9 @@ class RestaurantDatabaseManager:
 
     def get_menu_items(self, available_only=False):
         try:
-            query = "SELECT * FROM menu_items"
+            query = "SELECT * FROM menu_items WHERE is_retired = 0"
             if available_only:
-                query += " WHERE is_available = 1"
+                query += " AND is_available = 1"
             query += " ORDER BY category, name"
             self.cursor.execute(query)
             return self.cursor.fetchall()
@@ -270,8 +1095,18 @@ class RestaurantDatabaseManager:
             return False
 
     def delete_menu_item(self, item_id):
+        """Delete a menu item, or retire it if it has sales history."""
         try:
-            self.cursor.execute("DELETE FROM menu_items WHERE id=?", (item_id,))
+            self.cursor.execute(
+                "SELECT 1 FROM order_lines WHERE menu_item_id=? LIMIT 1", (item_id,)
+            )
+            if self.cursor.fetchone():
+                self.cursor.execute(
+                    "UPDATE menu_items SET is_retired=1, is_available=0 WHERE id=?",
+                    (item_id,),
+                )
+            else:
+                self.cursor.execute("DELETE FROM menu_items WHERE id=?", (item_id,))
             self.conn.commit()
             return True
         except Exception as e:
@@ -292,142 +1127,867 @@ class RestaurantDatabaseManager:
     def record_sale(
         self, menu_item_id, item_name, category, quantity, unit_price, total_amount
     ):
+        return self.record_order(
+            [
+                {
+                    "menu_item_id": menu_item_id,
+                    "item_name": item_name,
+                    "category": category,
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "total_amount": total_amount,
+                }
+            ]
+        )
+
+    def record_order(self, lines, order_ref=None):
+        """Record a multi-line order in one transaction.
+
+        Each line is a dict with the record_sale keyword arguments (item_name
+        and category are optional; names come from menu_items; unit_price
+        and total_amount are integer cents). Ingredients are reserved with a
+        conditional UPDATE per ingredient, so concurrent checkouts cannot
+        overdraw stock; if any ingredient is short the whole order is rolled
+        back and False is returned.
+
+        A busy or locked database is retried under self.retry_policy.
+        order_ref makes the call idempotent: if an order with that reference
+        is already recorded, nothing is written and True is returned. One is
+        generated when not given, so retries never record an order twice.
+        """
+        self.last_error = None
+        try:
+            lines = list(lines)
+            if not lines:
+                return False
+            return self.retry_policy.run(
+                "record_order", self._record_order, lines, order_ref or uuid.uuid4().hex
+            )
+        except Exception as e:
+            self.last_error = e
+            print(f"Error recording order: {e}")
+            return False
+
+    def _record_order(self, lines, order_ref):
+        try:
+            # Take the write lock up front so the recipes we read are the
+            # ones we deduct for.
+            self.cursor.execute("BEGIN IMMEDIATE")
+            deducted, _ = self._apply_order(
+                lines, order_ref, _order_ts(datetime.now())
+            )
+            if deducted:
+                self._refresh_menu_availability(
+                    self.get_menu_items_using_ingredients(deducted)
+                )
+            self.conn.commit()
+            return True
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def record_orders(self, orders, commit=True):
+        """Record a batch of orders in one transaction, e.g. for SalesWriter.
+
+        orders are dicts with order_ref, taken_at ("YYYY-MM-DD HH:MM:SS")
+        and lines as for record_order. These orders are already sold, so one
+        that is short of an ingredient (another till used the stock first)
+        is still recorded: its stock goes below zero and the order is
+        reported as overdrawn, for the stock to be recounted. Each order
+        gets its own savepoint: one whose order_ref is already recorded is
+        skipped, and one that cannot be recorded at all (malformed) is
+        rolled back on its own, so a bad order never holds up the rest. A
+        busy or locked database is retried under self.retry_policy. With
+        commit=False the transaction is left open for the caller to commit,
+        as SalesWriter does while it releases the orders' reservations.
+
+        Returns: {"rejected": [(order_ref, reason)], "overdrawn":
+        [(order_ref, ingredient_ids)]}, or None if the database stayed
+        locked. Any other error is raised.
+        """
+        try:
+            orders = list(orders)
+            if not orders:
+                return {"rejected": [], "overdrawn": []}
+            return self.retry_policy.run(
+                "record_orders", self._record_orders, orders, commit
+            )
+        except Exception as e:
+            if not self.retry_policy.is_transient(e):
+                raise
+            print(f"Error recording orders: {e}")
+            return None
+
+    def _record_orders(self, orders, commit):
         try:
-            now = datetime.now()
+            self.cursor.execute("BEGIN IMMEDIATE")
+            result = {"rejected": [], "overdrawn": []}
+            deducted = set()
+            for order in orders:
+                self.cursor.execute("SAVEPOINT order_entry")
+                try:
+                    ingredients, short = self._apply_order(
+                        order["lines"],
+                        order["order_ref"],
+                        _order_ts(datetime.fromisoformat(order["taken_at"])),
+                        overdraw=True,
+                    )
+                    deducted.update(ingredients)
+                    if short:
+                        result["overdrawn"].append((order["order_ref"], short))
+                except Exception as e:
+                    if self.retry_policy.is_transient(e):
+                        raise
+                    self.cursor.execute("ROLLBACK TO order_entry")
+                    result["rejected"].append((order.get("order_ref"), str(e)))
+                self.cursor.execute("RELEASE order_entry")
+            if deducted:
+                self._refresh_menu_availability(
+                    self.get_menu_items_using_ingredients(deducted)
+                )
+            if commit:
+                self.conn.commit()
+            return result
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _apply_order(self, lines, order_ref, order_ts, overdraw=False):
+        """Deduct stock for one order and insert it, in the caller's transaction.
+
+        An ingredient that is short raises InsufficientStockError, unless
+        overdraw is set: then its stock is deducted regardless, going below
+        zero, and it is reported as short.
+
+        Returns: (ids of the ingredients deducted, ids of those short); both
+        are empty if an order with this order_ref is already recorded.
+        """
+        # Already recorded, e.g. by an earlier attempt with the same ref.
+        self.cursor.execute("SELECT 1 FROM orders WHERE order_ref = ?", (order_ref,))
+        if self.cursor.fetchone():
+            return [], []
+
+        demand = {
+            ingredient_id: needed
+            for ingredient_id, _, _, needed, _ in self._ingredient_demand(lines)
+        }
+
+        short = []
+        for ingredient_id, needed in demand.items():
             self.cursor.execute(
+                "UPDATE inventory SET current_stock = current_stock - ? "
+                "WHERE id = ? AND current_stock >= ?",
+                (needed, ingredient_id, needed),
+            )
+            if self.cursor.rowcount == 1:
+                continue
+            if not overdraw:
+                raise InsufficientStockError(ingredient_id)
+            self.cursor.execute(
+                "UPDATE inventory SET current_stock = current_stock - ? WHERE id = ?",
+                (needed, ingredient_id),
+            )
+            short.append(ingredient_id)
+
+        self.cursor.execute(
+            """
+            INSERT INTO orders
+            (order_ts, line_count, items_sold, total_amount, order_ref)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (
+                order_ts,
+                len(lines),
+                sum(line["quantity"] for line in lines),
+                sum(line["total_amount"] for line in lines),
+                order_ref,
+            ),
+        )
+        order_id = self.cursor.lastrowid
+        self.cursor.executemany(
+            """
+            INSERT INTO order_lines
+            (order_id, menu_item_id, quantity, unit_price, total_amount)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            [
+                (
+                    order_id,
+                    line["menu_item_id"],
+                    line["quantity"],
+                    line["unit_price"],
+                    line["total_amount"],
+                )
+                for line in lines
+            ],
+        )
+        return list(demand), short
+
+    def import_sales(self, rows, batch_size=50000, progress=None):
+        """Bulk-load historical sales, e.g. an old POS export.
+
+        rows is an iterable of dicts shaped like the legacy sales table:
+        item_name, category, quantity, unit_price and total_amount (dollars),
+        order_date (YYYY-MM-DD) and order_time (HH:MM:SS). Consecutive rows
+        with the same order_id, or failing that the same date and time,
+        become one order. Unknown item names are added as retired menu items.
+
+        Unlike record_order this does not touch inventory. Each batch is
+        written with executemany in its own transaction, with the rollup
+        triggers dropped; the rollups are rebuilt once at the end, followed
+        by one menu availability refresh. progress, if given, is called as
+        progress(rows_done, seconds) after every batch. An import killed
+        before the triggers are back is repaired by the next open, see
+        repair_sales_triggers.
+
+        Returns: {"rows", "orders", "skipped", "seconds"}, or None on error.
+        """
+        start = time.perf_counter()
+        stats = {"rows": 0, "orders": 0, "skipped": 0, "seconds": 0.0}
+        menu_ids = {}
+        orders, lines = [], []
+        order_key = None
+        next_order_id = 0
+
+        def menu_item_id(name, category, unit_price, day):
+            if name not in menu_ids:
+                self.cursor.execute(
+                    """
+                    INSERT INTO menu_items
+                    (name, category, price, is_available, created_date,
+                     last_updated, is_retired)
+                    VALUES (?, ?, ?, 0, ?, ?, 1)
+                """,
+                    (name, category, unit_price, day, day),
+                )
+                menu_ids[name] = self.cursor.lastrowid
+            return menu_ids[name]
+
+        def flush():
+            self.cursor.executemany(
                 """
-                INSERT INTO sales
-                (item_name, category, quantity, unit_price, total_amount,
-                 order_date, order_time, day_of_week, month, year)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO orders
+                (id, order_ts, line_count, items_sold, total_amount)
+                VALUES (?, ?, ?, ?, ?)
             """,
-                (
-                    item_name,
-                    category,
-                    quantity,
-                    unit_price,
-                    total_amount,
-                    now.strftime("%Y-%m-%d"),
-                    now.strftime("%H:%M:%S"),
-                    now.strftime("%A"),
-                    now.strftime("%B"),
-                    now.year,
-                ),
+                orders,
             )
+            self.cursor.executemany(
+                """
+                INSERT INTO order_lines
+                (order_id, menu_item_id, quantity, unit_price, total_amount)
+                VALUES (?, ?, ?, ?, ?)
+            """,
+                lines,
+            )
+            self.conn.commit()
+            stats["orders"] += len(orders)
+            orders.clear()
+            lines.clear()
+            if progress:
+                progress(stats["rows"], time.perf_counter() - start)
 
-            recipe = self.get_recipe_for_item(menu_item_id)
-            if recipe:
-                for recipe_id, ingredient_id, ing_name, quantity_used, unit in recipe:
-                    ingredient = self.get_inventory_item_by_id(ingredient_id)
-                    if ingredient:
-                        new_stock = ingredient[2] - (quantity_used * quantity)
-                        self.update_inventory_stock(ingredient_id, new_stock)
-
+        try:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            for name in SALES_TRIGGERS:
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            self.cursor.execute("SELECT name, MIN(id) FROM menu_items GROUP BY name")
+            menu_ids.update(self.cursor.fetchall())
             self.conn.commit()
-            self.check_and_update_all_menu_availability()
-            return True
+
+            for number, row in enumerate(rows, start=1):
+                try:
+                    name = row.get("item_name") or "Unknown item"
+                    quantity = int(row.get("quantity") or 0)
+                    unit_price = to_cents(row.get("unit_price") or 0)
+                    total = row.get("total_amount")
+                    if total in (None, ""):
+                        total = unit_price * quantity
+                    else:
+                        total = to_cents(total)
+                    day = row["order_date"]
+                    clock = row.get("order_time") or "00:00:00"
+                    order_ts = _order_ts(datetime.fromisoformat(f"{day} {clock}"))
+                except (KeyError, TypeError, ValueError) as e:
+                    stats["skipped"] += 1
+                    if stats["skipped"] <= 10:
+                        print(f"Skipping row {number}: {e!r}")
+                    continue
+
+                key = row.get("order_id") or (day, clock)
+                if key != order_key:
+                    # Batches are only cut between orders, so none is split.
+                    if len(lines) >= batch_size:
+                        flush()
+                    if not orders:
+                        self.cursor.execute("BEGIN IMMEDIATE")
+                        self.cursor.execute(
+                            "SELECT MAX(IFNULL((SELECT seq FROM sqlite_sequence "
+                            "WHERE name = 'orders'), 0), IFNULL(MAX(id), 0)) + 1 "
+                            "FROM orders"
+                        )
+                        next_order_id = self.cursor.fetchone()[0]
+                    order_key = key
+                    orders.append([next_order_id, order_ts, 0, 0, 0])
+                    next_order_id += 1
+                order = orders[-1]
+                order[2] += 1
+                order[3] += quantity
+                order[4] += total
+                lines.append(
+                    (
+                        order[0],
+                        menu_item_id(name, row.get("category"), unit_price, day),
+                        quantity,
+                        unit_price,
+                        total,
+                    )
+                )
+                stats["rows"] += 1
+
+            if orders:
+                flush()
+            return stats
         except Exception as e:
             self.conn.rollback()
-            print(f"Error recording sale: {e}")
-            return False
+            print(f"Error importing sales: {e}")
+            return None
+        finally:
+            try:
+                self.cursor.execute("BEGIN")
+                _install_sales_triggers(self.cursor)
+                _rebuild_sales_rollups(self.cursor)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                print(f"Error rebuilding sales rollups: {e}")
+            self.check_and_update_all_menu_availability()
+            stats["seconds"] = time.perf_counter() - start
+
+    SALES_COLUMNS = (
+        "id",
+        "item_name",
+        "category",
+        "quantity",
+        "unit_price",
+        "total_amount",
+        "order_date",
+        "order_time",
+        "day_of_week",
+        "month",
+        "year",
+        "order_id",
+        "menu_item_id",
+        "order_ts",
+    )
+
+    @staticmethod
+    def _sales_filter(date_range=None, category=None):
+        conditions = []
+        params = []
+        if date_range:
+            # Inclusive dates, compared on the indexed integer timestamp.
+            start, end = (date.fromisoformat(day) for day in date_range)
+            conditions.append("order_ts >= ? AND order_ts < ?")
+            params.extend([_order_ts(start), _order_ts(end + timedelta(days=1))])
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
 
     def get_sales_data(self, date_range=None, category=None):
         try:
-            query = "SELECT * FROM sales"
-            params = []
-            conditions = []
-            if date_range:
-                conditions.append("order_date BETWEEN ? AND ?")
-                params.extend([date_range[0], date_range[1]])
-            if category:
-                conditions.append("category = ?")
-                params.append(category)
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            query += " ORDER BY order_date DESC, order_time DESC"
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            where, params = self._sales_filter(date_range, category)
+            order_by = " ORDER BY order_ts DESC, order_id DESC, id DESC"
+            rows = []
+            with closing(self._sales_sources(date_range)) as sources:
+                for _, source in sources:
+                    query = "SELECT * FROM " + source + where + order_by
+                    rows.extend(self.read_conn.execute(query, params).fetchall())
+            return rows
         except Exception as e:
             print(f"Error fetching sales data: {e}")
             return []
 
-    def get_sales_summary(self):
+    def iter_sales(self, date_range=None, category=None, batch_size=5000):
+        """Stream sales rows oldest first, holding at most batch_size in memory.
+
+        Same filters and row shape as get_sales_data. Runs on its own cursor,
+        so other queries can be issued while the generator is being consumed.
+        """
+        where, params = self._sales_filter(date_range, category)
+        with closing(self._sales_sources(date_range, newest_first=False)) as sources:
+            for _, source in sources:
+                with closing(self.read_conn.cursor()) as cursor:
+                    cursor.execute(
+                        f"SELECT * FROM {source}{where} ORDER BY order_ts, order_id, id",
+                        params,
+                    )
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield from rows
+
+    def iter_sales_columns(
+        self, columns=None, date_range=None, category=None, batch_size=5000
+    ):
+        """Stream sales as column batches: one {column: [values]} dict per batch.
+
+        columns defaults to every column in SALES_COLUMNS; ask only for what
+        you need to keep batches small.
+        """
+        columns = tuple(columns or self.SALES_COLUMNS)
+        unknown = set(columns) - set(self.SALES_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown sales columns: {sorted(unknown)}")
+
+        where, params = self._sales_filter(date_range, category)
+        with closing(self._sales_sources(date_range, newest_first=False)) as sources:
+            for _, source in sources:
+                with closing(self.read_conn.cursor()) as cursor:
+                    cursor.execute(
+                        f"SELECT {', '.join(columns)} FROM {source}"
+                        + where
+                        + " ORDER BY order_ts, order_id, id",
+                        params,
+                    )
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield dict(zip(columns, map(list, zip(*rows))))
+
+    def get_top_items(self, limit=5):
+        """Returns: list of (item_name, items_sold), best seller first."""
         try:
-            today = datetime.now().strftime("%Y-%m-%d")
-            self.cursor.execute(
-                "SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM sales WHERE order_date = ?",
-                (today,),
+            cursor = self.read_conn.execute(
+                """
+                SELECT m.name, t.items_sold
+                FROM item_sales_totals t
+                JOIN menu_items m ON m.id = t.menu_item_id
+                ORDER BY t.items_sold DESC LIMIT ?
+            """,
+                (limit,),
             )
-            today_count, today_revenue = self.cursor.fetchone()
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error getting top items: {e}")
+            return []
 
-            this_month = datetime.now().strftime("%Y-%m")
-            self.cursor.execute(
-                "SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM sales WHERE strftime('%Y-%m', order_date) = ?",
-                (this_month,),
+    def get_sales_page(self, limit=100, after=None):
+        """Keyset-paginated sales history, newest first.
+
+        A page holds every line of up to limit orders, so an order is never
+        split across pages. after is the sale_key() of the last row of the
+        previous page; pass None for the first page.
+        """
+        try:
+            rows = []
+            with closing(self._sales_sources()) as sources:
+                for schema, source in sources:
+                    # A page that runs past the oldest hot order carries on
+                    # into the archives, newest year first.
+                    query = f"SELECT id FROM {schema}.orders"
+                    params = []
+                    if after:
+                        query += " WHERE (order_ts, id) < (?, ?)"
+                        params.extend(after)
+                    query += " ORDER BY order_ts DESC, id DESC LIMIT ?"
+                    params.append(limit)
+                    page = self.read_conn.execute(
+                        f"SELECT * FROM {source} WHERE order_id IN ({query})"
+                        " ORDER BY order_ts DESC, order_id DESC, id DESC",
+                        params,
+                    ).fetchall()
+                    rows.extend(page)
+                    limit -= len({sale[11] for sale in page})
+                    if limit <= 0:
+                        break
+            return rows
+        except Exception as e:
+            print(f"Error fetching sales page: {e}")
+            return []
+
+    def get_sales_since(self, key):
+        """Sales of orders newer than the given sale_key(), newest first."""
+        try:
+            cursor = self.read_conn.execute(
+                """
+                SELECT * FROM sales
+                WHERE order_id IN (
+                    SELECT id FROM orders
+                    WHERE (order_ts, id) > (?, ?)
+                )
+                ORDER BY order_ts DESC, order_id DESC, id DESC
+            """,
+                tuple(key),
             )
-            month_count, month_revenue = self.cursor.fetchone()
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error fetching new sales: {e}")
+            return []
 
-            self.cursor.execute(
-                "SELECT item_name, SUM(quantity) as total_sold FROM sales GROUP BY item_name ORDER BY total_sold DESC LIMIT 1"
+    @staticmethod
+    def sale_key(sale):
+        """Pagination key of a sales row: (order_ts, order_id)."""
+        return (sale[13], sale[11])
+
+    @staticmethod
+    def get_period_bounds(period, today=None):
+        """Half-open [start, end) YYYY-MM-DD bounds for a period to date.
+
+        period is "today", "week" (from Monday), "month" or "year".
+        """
+        today = today or date.today()
+        if period == "today":
+            start = today
+        elif period == "week":
+            start = today - timedelta(days=today.weekday())
+        elif period == "month":
+            start = today.replace(day=1)
+        elif period == "year":
+            start = today.replace(month=1, day=1)
+        else:
+            raise ValueError(f"Unknown period: {period}")
+        return start.isoformat(), (today + timedelta(days=1)).isoformat()
+
+    def get_period_summary(self, period="today", date_range=None):
+        """Order count, items sold and revenue for a named period.
+
+        date_range, if given, is an explicit half-open [start, end) pair of
+        YYYY-MM-DD dates and overrides period.
+        """
+        start, end = date_range or self.get_period_bounds(period)
+        try:
+            cursor = self.read_conn.execute(
+                """
+                SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(items_sold), 0),
+                       COALESCE(SUM(revenue), 0)
+                FROM orders_daily
+                WHERE order_date >= ? AND order_date < ?
+            """,
+                (start, end),
             )
-            popular = self.cursor.fetchone()
+            count, items_sold, revenue = cursor.fetchone()
+            return {"count": count, "items_sold": items_sold, "revenue": revenue}
+        except Exception as e:
+            print(f"Error getting period summary: {e}")
+            return {"count": 0, "items_sold": 0, "revenue": 0}
 
-            return {
-                "today": {"count": today_count or 0, "revenue": today_revenue or 0},
-                "month": {"count": month_count or 0, "revenue": month_revenue or 0},
-                "popular_item": popular[0] if popular else "N/A",
-            }
+    def get_popular_item(self):
+        try:
+            cursor = self.read_conn.execute("""
+                SELECT m.name
+                FROM item_sales_totals t
+                JOIN menu_items m ON m.id = t.menu_item_id
+                ORDER BY t.items_sold DESC LIMIT 1
+            """)
+            popular = cursor.fetchone()
+            return popular[0] if popular else "N/A"
         except Exception as e:
-            print(f"Error getting sales summary: {e}")
-            return {
-                "today": {"count": 0, "revenue": 0},
-                "month": {"count": 0, "revenue": 0},
-                "popular_item": "N/A",
-            }
+            print(f"Error getting popular item: {e}")
+            return "N/A"
+
+    def get_average_order_value(self, date_range=None):
+        """Mean order total in cents, over all time or a [start, end) range."""
+        try:
+            query = "SELECT SUM(revenue), SUM(orders) FROM orders_daily"
+            params = []
+            if date_range:
+                query += " WHERE order_date >= ? AND order_date < ?"
+                params.extend([date_range[0], date_range[1]])
+            cursor = self.read_conn.execute(query, params)
+            revenue, orders = cursor.fetchone()
+            return round(revenue / orders) if orders else 0
+        except Exception as e:
+            print(f"Error getting average order value: {e}")
+            return 0
+
+    def get_sales_summary(self, periods=("today", "month")):
+        summary = {period: self.get_period_summary(period) for period in periods}
+        summary["popular_item"] = self.get_popular_item()
+        return summary
+
+    def rebuild_sales_rollups(self):
+        """Recompute every rollup table from orders / order_lines."""
+        try:
+            self.cursor.execute("BEGIN")
+            _rebuild_sales_rollups(self.cursor)
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Error rebuilding sales rollups: {e}")
+            return False
 
     # ── Analytics ───────────────────────────────────────────────
 
     def get_category_performance(self):
         try:
-            self.cursor.execute("""
-                SELECT category, COUNT(*) as orders, SUM(quantity) as items_sold,
-                       SUM(total_amount) as revenue
-                FROM sales GROUP BY category ORDER BY revenue DESC
+            cursor = self.read_conn.execute("""
+                SELECT m.category, SUM(t.orders) as orders,
+                       SUM(t.items_sold) as items_sold, SUM(t.revenue) as revenue
+                FROM sales_daily t
+                JOIN menu_items m ON m.id = t.menu_item_id
+                GROUP BY m.category ORDER BY revenue DESC
             """)
-            return self.cursor.fetchall()
+            return cursor.fetchall()
         except Exception as e:
             print(f"Error getting category performance: {e}")
             return []
 
     def get_hourly_sales_pattern(self):
         try:
-            self.cursor.execute("""
-                SELECT strftime('%H', order_time) as hour, COUNT(*) as orders,
-                       SUM(total_amount) as revenue
-                FROM sales GROUP BY hour ORDER BY hour
+            cursor = self.read_conn.execute("""
+                SELECT printf('%02d', hour) as hour, SUM(orders) as orders,
+                       SUM(revenue) as revenue
+                FROM sales_hourly GROUP BY 1 ORDER BY 1
             """)
-            return self.cursor.fetchall()
+            return cursor.fetchall()
         except Exception as e:
             print(f"Error getting hourly sales pattern: {e}")
             return []
 
+    WEEKDAYS = (
+        "Monday",
+        "Tuesday",
+        "Wednesday",
+        "Thursday",
+        "Friday",
+        "Saturday",
+        "Sunday",
+    )
+
+    def get_weekday_sales_pattern(self):
+        """Returns: list of (day name, orders, revenue), Monday first."""
+        try:
+            # From the daily rollup, so archived years are included.
+            cursor = self.read_conn.execute("""
+                SELECT (strftime('%w', order_date) + 6) % 7 + 1 AS weekday,
+                       SUM(orders), SUM(revenue)
+                FROM orders_daily GROUP BY weekday ORDER BY weekday
+            """)
+            return [
+                (self.WEEKDAYS[weekday - 1], orders, revenue)
+                for weekday, orders, revenue in cursor.fetchall()
+            ]
+        except Exception as e:
+            print(f"Error getting weekday sales pattern: {e}")
+            return []
+
     def get_daily_sales_trend(self, days=30):
         try:
             # FIX: Use parameterized query instead of string formatting
-            self.cursor.execute(
+            cursor = self.read_conn.execute(
                 """
-                SELECT order_date, COUNT(*) as orders, SUM(total_amount) as revenue
-                FROM sales
+                SELECT order_date, orders, revenue
+                FROM orders_daily
                 WHERE order_date >= date('now', '-' || ? || ' days')
-                GROUP BY order_date ORDER BY order_date
+                ORDER BY order_date
             """,
                 (str(days),),
             )
-            return self.cursor.fetchall()
+            return cursor.fetchall()
         except Exception as e:
             print(f"Error getting daily sales trend: {e}")
             return []
 
+    def get_revenue_by_period(self, period="daily", date_range=None):
+        """Returns: list of (period_key, orders, revenue), oldest first.
+
+        period is "daily" (YYYY-MM-DD), "monthly" (YYYY-MM) or "yearly" (YYYY);
+        date_range is an inclusive [start, end] pair of YYYY-MM-DD dates.
+        """
+        key_length = {"daily": 10, "monthly": 7, "yearly": 4}[period]
+        try:
+            query = f"SELECT substr(order_date, 1, {key_length}) as period, SUM(orders), SUM(revenue) FROM orders_daily"
+            params = []
+            if date_range:
+                query += " WHERE order_date BETWEEN ? AND ?"
+                params.extend([date_range[0], date_range[1]])
+            query += " GROUP BY 1 ORDER BY 1"
+            cursor = self.read_conn.execute(query, params)
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error getting revenue by period: {e}")
+            return []
+
+    # ── Archives ────────────────────────────────────────────────
+
+    _attach_ids = itertools.count(1)
+
+    def _archive_path(self, year):
+        """dinesight_2021.db, next to the database itself."""
+        path = Path(self.db_name)
+        return path.with_name(f"{path.stem}_{year}{path.suffix}")
+
+    def get_archives(self):
+        """Returns: list of (year, file_name, orders, order_lines, revenue, archived_at)."""
+        try:
+            cursor = self.read_conn.execute("SELECT * FROM archives ORDER BY year")
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error fetching archives: {e}")
+            return []
+
+    def _archive_files(self, date_range=None, newest_first=True):
+        query = "SELECT file_name FROM archives"
+        params = []
+        if date_range:
+            query += " WHERE year BETWEEN ? AND ?"
+            params.extend(int(day[:4]) for day in date_range)
+        query += " ORDER BY year DESC" if newest_first else " ORDER BY year"
+        return [row[0] for row in self.read_conn.execute(query, params)]
+
+    @contextmanager
+    def _attached_archive(self, file_name):
+        """Attach an archive read-only to read_conn; yields its schema name."""
+        schema = f"archive_{next(self._attach_ids)}"
+        path = Path(self.db_name).with_name(file_name)
+        uri = path.resolve().as_uri() + "?mode=ro"
+        self.read_conn.execute(f"ATTACH DATABASE ? AS {schema}", (uri,))
+        try:
+            yield schema
+        finally:
+            self.read_conn.execute(f"DETACH DATABASE {schema}")
+
+    def _sales_sources(self, date_range=None, newest_first=True):
+        """Yield (schema, FROM source) for the hot sales view and every
+        archive the date range reaches, attaching one archive at a time.
+
+        Archived years are always older than the orders still in this
+        database, so reading the sources in order keeps rows in order.
+        """
+        if newest_first:
+            yield "main", "sales"
+        for file_name in self._archive_files(date_range, newest_first):
+            with self._attached_archive(file_name) as schema:
+                yield schema, f"({_archive_sales_select(schema)})"
+        if not newest_first:
+            yield "main", "sales"
+
+    def archive_year(self, year):
+        """Move every order of a closed year into its own archive file.
+
+        Years must be archived oldest first. The rollups keep the year's
+        totals, so summaries and charts are unaffected; row-level readers
+        (get_sales_data, iter_sales, get_sales_page) attach the archive
+        when their date range reaches it. Safe to re-run after a crash.
+
+        Returns: dict with year, file_name, orders, order_lines and revenue,
+        or None if nothing was archived.
+        """
+        year = int(year)
+        if self.db_name == ":memory:":
+            print("In-memory databases cannot be archived")
+            return None
+        if year >= date.today().year:
+            print(f"Cannot archive {year}: only closed years can be archived")
+            return None
+        start = _order_ts(date(year, 1, 1))
+        end = _order_ts(date(year + 1, 1, 1))
+        path = self._archive_path(year)
+        try:
+            self.cursor.execute(
+                "SELECT COUNT(*) FROM orders WHERE order_ts < ?", (start,)
+            )
+            if self.cursor.fetchone()[0]:
+                print(f"Cannot archive {year}: archive the years before it first")
+                return None
+            self.cursor.execute(
+                "SELECT COUNT(*) FROM orders WHERE order_ts >= ? AND order_ts < ?",
+                (start, end),
+            )
+            if not self.cursor.fetchone()[0]:
+                print(f"No orders to archive for {year}")
+                return None
+
+            self.conn.commit()
+            self.cursor.execute("ATTACH DATABASE ? AS archive", (str(path),))
+        except Exception as e:
+            print(f"Error archiving {year}: {e}")
+            return None
+
+        try:
+            # Copy first and commit, then delete: a transaction spanning two
+            # WAL databases is not atomic, so a crash in between leaves the
+            # orders in both files and re-running finishes the move.
+            self.cursor.execute("BEGIN IMMEDIATE")
+            for sql in _ARCHIVE_SCHEMA:
+                self.cursor.execute(sql)
+            self.cursor.execute(
+                """
+                INSERT OR IGNORE INTO archive.orders
+                    (id, order_ts, line_count, items_sold, total_amount)
+                SELECT id, order_ts, line_count, items_sold, total_amount
+                FROM main.orders WHERE order_ts >= ? AND order_ts < ?
+            """,
+                (start, end),
+            )
+            self.cursor.execute(
+                """
+                INSERT OR IGNORE INTO archive.order_lines
+                SELECT l.id, l.order_id, l.menu_item_id, l.quantity,
+                       l.unit_price, l.total_amount
+                FROM main.order_lines l
+                JOIN main.orders o ON o.id = l.order_id
+                WHERE o.order_ts >= ? AND o.order_ts < ?
+            """,
+                (start, end),
+            )
+            self.conn.commit()
+
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.cursor.execute(
+                """
+                DELETE FROM main.order_lines WHERE order_id IN (
+                    SELECT id FROM main.orders WHERE order_ts >= ? AND order_ts < ?
+                )
+            """,
+                (start, end),
+            )
+            self.cursor.execute(
+                "DELETE FROM main.orders WHERE order_ts >= ? AND order_ts < ?",
+                (start, end),
+            )
+            self.cursor.execute("""
+                SELECT (SELECT COUNT(*) FROM archive.orders),
+                       (SELECT COUNT(*) FROM archive.order_lines),
+                       (SELECT COALESCE(SUM(total_amount), 0) FROM archive.orders)
+            """)
+            orders, order_lines, revenue = self.cursor.fetchone()
+            self.cursor.execute(
+                """
+                INSERT OR REPLACE INTO main.archives
+                (year, file_name, orders, order_lines, revenue, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    year,
+                    path.name,
+                    orders,
+                    order_lines,
+                    revenue,
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+            self.conn.commit()
+            return {
+                "year": year,
+                "file_name": path.name,
+                "orders": orders,
+                "order_lines": order_lines,
+                "revenue": revenue,
+            }
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Error archiving {year}: {e}")
+            return None
+        finally:
+            self.cursor.execute("DETACH DATABASE archive")
+
     # ── Recipes ─────────────────────────────────────────────────
 
     def add_recipe_item(self, menu_item_id, ingredient_id, quantity_used):
@@ -436,6 +1996,7 @@ class RestaurantDatabaseManager:
                 "INSERT INTO recipes (menu_item_id, ingredient_id, quantity_used) VALUES (?, ?, ?)",
                 (menu_item_id, ingredient_id, quantity_used),
             )
+            self._refresh_menu_availability([menu_item_id])
             self.conn.commit()
             return True
         except Exception as e:
@@ -460,9 +2021,26 @@ class RestaurantDatabaseManager:
             print(f"Error getting recipe for item: {e}")
             return []
 
+    def get_menu_items_using_ingredients(self, ingredient_ids):
+        """Reverse recipe lookup: ids of menu items that use any of the ingredients."""
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return []
+        placeholders = ", ".join("?" * len(ingredient_ids))
+        self.cursor.execute(
+            f"SELECT DISTINCT menu_item_id FROM recipes WHERE ingredient_id IN ({placeholders})",
+            ingredient_ids,
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
     def delete_recipe_item(self, recipe_id):
         try:
+            self.cursor.execute(
+                "SELECT menu_item_id FROM recipes WHERE id=?", (recipe_id,)
+            )
+            affected = [row[0] for row in self.cursor.fetchall()]
             self.cursor.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
+            self._refresh_menu_availability(affected)
             self.conn.commit()
             return True
         except Exception as e:
@@ -471,38 +2049,265 @@ class RestaurantDatabaseManager:
 
     # ── Stock / Availability ────────────────────────────────────
 
-    def check_stock_for_sale(self, menu_item_id, quantity_sold):
+    def _ingredient_demand(self, lines):
+        """Explode order lines into total demand per ingredient, in one query.
+
+        An ingredient that was deleted from inventory is reported with stock
+        0, so an order that needs it is short.
+
+        Returns: list of (ingredient_id, ingredient_name, unit, needed, in_stock)
+        """
+        quantities = {}
+        for line in lines:
+            quantities[line["menu_item_id"]] = (
+                quantities.get(line["menu_item_id"], 0) + line["quantity"]
+            )
+        if not quantities:
+            return []
+
+        placeholders = ", ".join("?" * len(quantities))
+        self.cursor.execute(
+            f"""
+            SELECT r.menu_item_id, r.ingredient_id,
+                   COALESCE(i.ingredient_name,
+                            'Ingredient ' || r.ingredient_id || ' (deleted)'),
+                   i.unit, r.quantity_used, COALESCE(i.current_stock, 0)
+            FROM recipes r
+            LEFT JOIN inventory i ON r.ingredient_id = i.id
+            WHERE r.menu_item_id IN ({placeholders})
+        """,
+            list(quantities),
+        )
+        demand = {}
+        for menu_item_id, ingredient_id, name, unit, quantity_used, stock in (
+            self.cursor.fetchall()
+        ):
+            entry = demand.setdefault(ingredient_id, [ingredient_id, name, unit, 0, stock])
+            entry[3] += quantity_used * quantities[menu_item_id]
+        return [tuple(entry) for entry in demand.values()]
+
+    def _stock_check(self, lines):
+        """Returns: ({ingredient_id: needed}, shortfalls) for an order.
+
+        Stock still reserved by orders the sales writer has accepted but not
+        yet recorded counts as used. Stock is read while the writer holds
+        its batches back, so an order counts once, either in the stock or in
+        the reservations.
+        """
+        reserved = (
+            self.sales_writer.pending_demand() if self.sales_writer else nullcontext({})
+        )
+        with reserved as pending:
+            demand = self._ingredient_demand(lines)
+        shortfalls = []
+        for ingredient_id, name, unit, needed, stock in demand:
+            if ingredient_id in pending:
+                stock = (stock or 0) - pending[ingredient_id]
+            if (stock or 0) < needed:
+                shortfalls.append((ingredient_id, name, unit, needed, stock))
+        return {entry[0]: entry[3] for entry in demand}, shortfalls
+
+    def check_stock_for_order(self, lines):
+        """Cart-level stock check that sums ingredients shared between lines.
+
+        lines are dicts with at least menu_item_id and quantity. Returns every
+        shortfall as (ingredient_id, ingredient_name, unit, needed, in_stock);
+        an empty list means the whole order can be made. Returns None if the
+        check itself failed.
+        """
         try:
-            recipe = self.get_recipe_for_item(menu_item_id)
-            if not recipe:
-                return True
+            return self._stock_check(lines)[1]
+        except Exception as e:
+            print(f"Error checking stock for order: {e}")
+            return None
 
-            for recipe_id, ingredient_id, ing_name, quantity_used, unit in recipe:
-                total_needed = quantity_used * quantity_sold
-                ingredient = self.get_inventory_item_by_id(ingredient_id)
-                if not ingredient or ingredient[2] < total_needed:
-                    return False
-            return True
+    def checkout_order(self, lines, order_ref=None):
+        """check_stock_for_order, then record_order if nothing is short.
+
+        With a sales_writer attached the order is handed to it instead, and
+        counts as recorded once it is in the writer's journal.
+
+        Returns: (recorded, shortfalls); shortfalls is None if the stock
+        check itself failed. On failure self.last_error holds the exception.
+        """
+        self.last_error = None
+        try:
+            demand, shortfalls = self._stock_check(lines)
         except Exception as e:
-            print(f"Error checking stock: {e}")
-            return False
+            self.last_error = e
+            print(f"Error checking stock for order: {e}")
+            return False, None
+        if shortfalls:
+            return False, shortfalls
+        if self.sales_writer is not None:
+            try:
+                self.sales_writer.submit(lines, order_ref, demand)
+                return True, []
+            except Exception as e:
+                self.last_error = e
+                print(f"Error journaling order: {e}")
+                return False, []
+        return self.record_order(lines, order_ref), []
 
-    def check_and_update_all_menu_availability(self):
+    def check_stock_for_sale(self, menu_item_id, quantity_sold):
+        shortfalls = self.check_stock_for_order(
+            [{"menu_item_id": menu_item_id, "quantity": quantity_sold}]
+        )
+        return shortfalls == []
+
+    def _refresh_menu_availability(self, menu_item_ids=None):
+        """Recompute is_available in one set-based UPDATE, without committing.
+
+        An item is available when every ingredient in its recipe has at least
+        the total quantity one portion needs; a recipe ingredient that no
+        longer exists in inventory counts as short. Retired items stay
+        unavailable. With menu_item_ids only those items are re-checked;
+        otherwise the whole menu is.
+        """
+        targets = recipe_filter = from_targets = ""
+        params = []
+        if menu_item_ids is not None:
+            menu_item_ids = list(menu_item_ids)
+            if not menu_item_ids:
+                return
+            # Driven from the id list, so each item is a rowid lookup even
+            # when a common ingredient touches a good part of the menu.
+            values = ", ".join(["(?)"] * len(menu_item_ids))
+            targets = f"targets(id) AS (VALUES {values}),"
+            recipe_filter = "WHERE r.menu_item_id IN targets"
+            from_targets = "FROM targets"
+            params = menu_item_ids
+
+        self.cursor.execute(
+            f"""
+            WITH {targets} short_items(menu_item_id) AS (
+                SELECT r.menu_item_id
+                FROM recipes r
+                LEFT JOIN inventory i ON i.id = r.ingredient_id
+                {recipe_filter}
+                GROUP BY r.menu_item_id, r.ingredient_id
+                HAVING COALESCE(MAX(i.current_stock), 0) < SUM(r.quantity_used)
+            )
+            UPDATE menu_items
+            SET is_available = menu_items.id NOT IN short_items
+            {from_targets}
+            WHERE {"menu_items.id = targets.id AND" if targets else ""}
+                  is_retired = 0
+              AND is_available IS NOT (menu_items.id NOT IN short_items)
+        """,
+            params,
+        )
+
+    def update_menu_availability_for_ingredients(self, ingredient_ids):
+        """Re-check only the menu items whose recipes use the given ingredients."""
         try:
-            menu_items = self.get_menu_items()
-            for item in menu_items:
-                item_id = item[0]
-                currently_available = bool(item[7])
-                can_make = self.check_stock_for_sale(item_id, 1)
+            self._refresh_menu_availability(
+                self.get_menu_items_using_ingredients(ingredient_ids)
+            )
+            self.conn.commit()
+        except Exception as e:
+            print(f"Error updating menu availability: {e}")
 
-                if currently_available != can_make:
-                    self.update_menu_item_availability(item_id, can_make)
+    def check_and_update_all_menu_availability(self):
+        try:
+            self._refresh_menu_availability()
             self.conn.commit()
         except Exception as e:
             print(f"Error updating menu availability: {e}")
 
+    # ── Backup ──────────────────────────────────────────────────
+
+    def backup(self, directory="backups", keep=14, pages=1024, progress=None):
+        """Copy the database to a dated snapshot while the app keeps running.
+
+        Writes <directory>/dinesight_YYYY-MM-DD_HHMMSS.db through the SQLite
+        backup API, `pages` pages per step, checks it with PRAGMA
+        quick_check and keeps only the newest `keep` snapshots. Archive
+        files are copied alongside the first time they are missing.
+
+        progress(copied_pages, total_pages) is called after each step.
+        Returns: dict with file, pages, seconds, archives and removed, or None.
+        """
+        if self.db_name == ":memory:":
+            print("In-memory databases cannot be backed up")
+            return None
+        start = time.perf_counter()
+        source = Path(self.db_name)
+        directory = Path(directory)
+        stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        target = directory / f"{source.stem}_{stamp}{source.suffix}"
+        partial = target.with_name(target.name + ".part")
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            # Only a checked copy ever gets a snapshot name.
+            copied = self._backup_file(source, partial, pages, progress)
+            partial.replace(target)
+
+            archives = []
+            for archive in self.get_archives():
+                archive_copy = directory / archive[1]
+                if not archive_copy.exists():
+                    self._backup_file(source.with_name(archive[1]), archive_copy, pages)
+                    archives.append(archive_copy.name)
+
+            snapshots = sorted(
+                directory.glob(f"{source.stem}_????-??-??_??????{source.suffix}")
+            )
+            removed = snapshots[:-keep] if keep else []
+            for snapshot in removed:
+                snapshot.unlink()
+
+            return {
+                "file": str(target),
+                "pages": copied,
+                "seconds": time.perf_counter() - start,
+                "archives": archives,
+                "removed": [snapshot.name for snapshot in removed],
+            }
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            print(f"Error backing up database: {e}")
+            return None
+
+    @staticmethod
+    def _backup_file(source, target, pages=1024, progress=None):
+        """Online copy of one database file; returns its page count."""
+        src = sqlite3.connect(
+            source.resolve().as_uri() + "?mode=ro", uri=True, isolation_level=None
+        )
+        dst = sqlite3.connect(target, isolation_level=None)
+        try:
+            # One read transaction for the whole copy: in WAL mode it is a
+            # consistent snapshot that never blocks checkouts, and commits
+            # made meanwhile do not restart the backup from the first page.
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            report = (
+                (lambda status, remaining, total: progress(total - remaining, total))
+                if progress
+                else None
+            )
+            src.backup(dst, pages=pages, progress=report)
+            check = dst.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"quick_check of {target.name}: {check}")
+            return dst.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            dst.close()
+            src.close()
+
     def close(self):
+        if self.conn is None:
+            return
+        if self.read_conn is not self.conn:
+            self.read_conn.close()
+        self.read_conn = None
+        try:
+            self.cursor.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
         self.conn.close()
+        self.conn = None
 
 
 DatabaseManager = RestaurantDatabaseManager
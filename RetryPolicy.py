@@ -0,0 +1,102 @@
+import random
+import sqlite3
+import threading
+import time
+
+
+class RetryPolicy:
+    """Retries write transactions that fail on a busy or locked database.
+
+    busy_timeout already makes SQLite wait for the write lock; what still
+    gets through as "database is locked" (a wait that timed out, or a
+    transaction that could not be upgraded to a writer) is retried here
+    with exponential backoff and full jitter, until max_attempts is reached
+    or the next wait would pass the deadline. Any other error is raised at
+    once. The operation must roll back its own transaction when it fails,
+    so that running it again is safe.
+
+    stats() reports calls, retries, waiting time and give-ups per operation.
+    """
+
+    def __init__(
+        self, max_attempts=6, base_delay=0.025, max_delay=1.0, deadline=10.0, seed=None
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def is_transient(error):
+        message = str(error).lower()
+        return isinstance(error, sqlite3.OperationalError) and (
+            "locked" in message or "busy" in message
+        )
+
+    def backoff(self, retry):
+        """Seconds to wait before the retry-th retry (1, 2, ...)."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+        return self._random.uniform(0, ceiling)
+
+    def run(self, name, operation, *args, **kwargs):
+        """operation(*args, **kwargs), retried on transient errors."""
+        start = time.monotonic()
+        waited = 0.0
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                if not self.is_transient(e):
+                    self._record(name, attempt - 1, waited, "errors")
+                    raise
+                pause = self.backoff(attempt)
+                late = time.monotonic() - start + pause > self.deadline
+                if attempt == self.max_attempts or late:
+                    self._record(name, attempt - 1, waited, "gave_up")
+                    raise
+                time.sleep(pause)
+                waited += pause
+            else:
+                self._record(name, attempt - 1, waited)
+                return result
+
+    # ── Metrics ─────────────────────────────────────────────────
+
+    def _record(self, name, retries, waited, outcome=None):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    "calls": 0,
+                    "retried_calls": 0,
+                    "retries": 0,
+                    "wait_ms": 0.0,
+                    "max_wait_ms": 0.0,
+                    "gave_up": 0,
+                    "errors": 0,
+                }
+            stats["calls"] += 1
+            stats["retried_calls"] += retries > 0
+            stats["retries"] += retries
+            stats["wait_ms"] += waited * 1000
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], waited * 1000)
+            if outcome:
+                stats[outcome] += 1
+
+    def stats(self):
+        """Returns: {operation: {calls, retried_calls, retries, wait_ms, ...}}."""
+        with self._lock:
+            return {
+                name: {
+                    key: round(value, 3) if isinstance(value, float) else value
+                    for key, value in stats.items()
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -1,14 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+from RestaurantDatabaseManager import format_money, to_cents
 
 
 class SalesLogger(tk.Frame):
-    def __init__(self, parent, colors):
+    HISTORY_PAGE_SIZE = 100
+
+    def __init__(self, parent, colors, db, worker):
         super().__init__(parent, bg=colors['background'])
-        self.db = RestaurantDatabaseManager()
+        self.db = db
+        self.worker = worker
         self.colors = colors
 
+        # Keyset pagination state for the sales history. Pages load on the
+        # DB worker; history_generation drops pages requested before a reset.
+        self.history_newest_key = None
+        self.history_oldest_key = None
+        self.history_exhausted = False
+        self.history_loading = False
+        self.history_generation = 0
+
         self.selected_item_id = None
         self.selected_item_name = None
         self.selected_item_category = None
@@ -128,10 +140,17 @@ class SalesLogger(tk.Frame):
         self.sales_tree.column("Date", width=95, anchor="center")
         self.sales_tree.column("Time", width=70, anchor="center")
 
-        v_scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.sales_tree.yview)
-        self.sales_tree.configure(yscrollcommand=v_scroll.set)
+        self.sales_scroll = ttk.Scrollbar(tree_frame, orient="vertical",
+                                          command=self.sales_tree.yview)
+        self.sales_tree.configure(yscrollcommand=self.on_history_scroll)
         self.sales_tree.pack(side="left", fill="both", expand=True)
-        v_scroll.pack(side="right", fill="y")
+        self.sales_scroll.pack(side="right", fill="y")
+
+    def on_history_scroll(self, first, last):
+        self.sales_scroll.set(first, last)
+        # Fetch the next page once the user nears the bottom
+        if float(last) > 0.9 and not self.history_exhausted:
+            self.load_more_sales()
 
     # Logging Form
 
@@ -184,8 +203,9 @@ class SalesLogger(tk.Frame):
                    command=self.increment_qty).pack(side="left")
 
         # Buttons
-        ttk.Button(form, text="Log Sale", command=self.log_sale,
-                   style="Accent.TButton").pack(fill="x", pady=(0, 8))
+        self.log_btn = ttk.Button(form, text="Log Sale", command=self.log_sale,
+                                  style="Accent.TButton")
+        self.log_btn.pack(fill="x", pady=(0, 8))
         ttk.Button(form, text="Clear", command=self.clear_form).pack(fill="x")
 
     # Data Operations
@@ -198,7 +218,7 @@ class SalesLogger(tk.Frame):
         items = self.db.get_menu_items(available_only=True)
         for item in items:
             self.menu_tree.insert("", "end", values=(
-                item[0], item[1], item[2], "${:.2f}".format(item[4])
+                item[0], item[1], item[2], format_money(item[4])
             ))
 
     def filter_menu(self):
@@ -211,19 +231,79 @@ class SalesLogger(tk.Frame):
             if query and query not in item[1].lower() and query not in (item[2] or "").lower():
                 continue
             self.menu_tree.insert("", "end", values=(
-                item[0], item[1], item[2], "${:.2f}".format(item[4])
+                item[0], item[1], item[2], format_money(item[4])
             ))
 
     def refresh_sales_history(self):
         for row in self.sales_tree.get_children():
             self.sales_tree.delete(row)
 
-        sales = self.db.get_sales_data()
+        self.history_newest_key = None
+        self.history_oldest_key = None
+        self.history_exhausted = False
+        self.history_loading = False
+        self.history_generation += 1
+        self.load_more_sales()
+
+    def load_more_sales(self):
+        if self.history_loading:
+            return
+        self.history_loading = True
+        self.sales_tree.insert("", "end", iid="loading", values=("", "Loading...", "", "", "", ""))
+
+        generation = self.history_generation
+        self.worker.call("get_sales_page", self.HISTORY_PAGE_SIZE,
+                         after=self.history_oldest_key,
+                         on_done=lambda sales: self.append_sales_page(generation, sales),
+                         owner=self)
+
+    def append_sales_page(self, generation, sales):
+        if generation != self.history_generation:
+            return
+        self.history_loading = False
+        if self.sales_tree.exists("loading"):
+            self.sales_tree.delete("loading")
+        if len(sales) < self.HISTORY_PAGE_SIZE:
+            self.history_exhausted = True
+        if not sales:
+            return
+
+        if self.history_newest_key is None:
+            self.history_newest_key = self.db.sale_key(sales[0])
+        self.history_oldest_key = self.db.sale_key(sales[-1])
         for sale in sales:
-            self.sales_tree.insert("", "end", values=(
-                sale[0], sale[1], sale[3],
-                "${:.2f}".format(sale[5]), sale[6], sale[7]
-            ))
+            self.sales_tree.insert("", "end", values=self.history_row(sale))
+
+    def prepend_new_sales(self):
+        if self.history_newest_key is None:
+            self.refresh_sales_history()
+            return
+
+        generation = self.history_generation
+        self.worker.call(self.fetch_new_sales, self.history_newest_key,
+                         on_done=lambda sales: self.prepend_sales(generation, sales),
+                         owner=self)
+
+    @staticmethod
+    def fetch_new_sales(db, key):
+        # A sale the writer has just journaled may not be in the database yet;
+        # it normally is within milliseconds. Wait only briefly so a locked
+        # database never holds up the worker queue; anything later shows on
+        # the next refresh.
+        if db.sales_writer:
+            db.sales_writer.sync(timeout=0.2)
+        return db.get_sales_since(key)
+
+    def prepend_sales(self, generation, sales):
+        if generation != self.history_generation or not sales:
+            return
+        self.history_newest_key = self.db.sale_key(sales[0])
+        for index, sale in enumerate(sales):
+            self.sales_tree.insert("", index, values=self.history_row(sale))
+
+    def history_row(self, sale):
+        return (sale[0], sale[1], sale[3],
+                format_money(sale[5]), sale[6], sale[7])
 
     def on_item_select(self, event):
         sel = self.menu_tree.selection()
@@ -232,10 +312,10 @@ class SalesLogger(tk.Frame):
             self.selected_item_id = int(data[0])
             self.selected_item_name = data[1]
             self.selected_item_category = data[2]
-            self.selected_item_price = float(str(data[3]).strip('$'))
+            self.selected_item_price = to_cents(data[3])
 
             self.item_name_var.set(self.selected_item_name)
-            self.item_price_var.set("${:.2f} per unit".format(self.selected_item_price))
+            self.item_price_var.set("{} per unit".format(format_money(self.selected_item_price)))
             self.quantity_var.set("1")
 
     def increment_qty(self):
@@ -266,29 +346,48 @@ class SalesLogger(tk.Frame):
             messagebox.showerror("Invalid Quantity", "Enter a valid positive number.")
             return
 
-        if not self.db.check_stock_for_sale(self.selected_item_id, quantity):
+        total = self.selected_item_price * quantity
+
+        lines = [{
+            'menu_item_id': self.selected_item_id,
+            'item_name': self.selected_item_name,
+            'category': self.selected_item_category,
+            'quantity': quantity,
+            'unit_price': self.selected_item_price,
+            'total_amount': total,
+        }]
+        # Check and record on the DB worker so a locked database cannot
+        # freeze the window; the button is re-enabled when the answer lands.
+        self.log_btn.config(state="disabled")
+        self.worker.call("checkout_order", lines,
+                         on_done=lambda result: self.log_sale_done(lines, *result),
+                         on_error=lambda error: self.log_sale_done(lines, False, []),
+                         owner=self)
+
+    def log_sale_done(self, lines, recorded, shortfalls):
+        self.log_btn.config(state="normal")
+        if shortfalls is None:
+            messagebox.showerror("Stock Error", "Could not check stock levels.")
+            return
+        if shortfalls:
+            missing = "".join("\n- {}: need {:g} {}, have {:g}".format(
+                name, needed, unit or "", stock or 0)
+                for _, name, unit, needed, stock in shortfalls)
             messagebox.showerror("Out of Stock",
-                                 "Not enough ingredients in inventory for this sale.")
+                                 "Not enough ingredients in inventory for this sale." + missing)
             return
 
-        total = self.selected_item_price * quantity
+        if not recorded:
+            messagebox.showerror("Error", "Failed to log sale.")
+            return
 
-        try:
-            self.db.record_sale(
-                menu_item_id=self.selected_item_id,
-                item_name=self.selected_item_name,
-                category=self.selected_item_category,
-                quantity=quantity,
-                unit_price=self.selected_item_price,
-                total_amount=total
-            )
-            messagebox.showinfo("Sale Logged",
-                                "Logged: {} x{}\nTotal: ${:.2f}".format(
-                                    self.selected_item_name, quantity, total))
-            self.refresh_menu_list()
-            self.refresh_sales_history()
-        except Exception as e:
-            messagebox.showerror("Error", "Failed to log sale: {}".format(e))
+        line = lines[0]
+        messagebox.showinfo("Sale Logged",
+                            "Logged: {} x{}\nTotal: {}".format(
+                                line['item_name'], line['quantity'],
+                                format_money(line['total_amount'])))
+        self.refresh_menu_list()
+        self.prepend_new_sales()
 
     def clear_form(self):
         self.selected_item_id = None
@@ -0,0 +1,373 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(file):
+    """Take an exclusive lock on an open journal without waiting.
+
+    Returns: True if this handle now holds it. The lock is released when
+    the handle is closed or the process dies.
+    """
+    try:
+        if fcntl:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _still_linked(file, path):
+    try:
+        return os.path.samestat(os.fstat(file.fileno()), os.stat(path))
+    except OSError:
+        return False
+
+
+class SalesWriter:
+    """Group-commit writer for checkouts: journal first, database shortly after.
+
+    submit() appends the order to an append-only journal of JSON lines and
+    returns once the journal is fsynced; orders submitted at the same time
+    share one fsync. A background thread records journaled orders with
+    RestaurantDatabaseManager.record_orders, one transaction per batch,
+    every flush_interval seconds, and empties the journal whenever
+    everything in it is in the database. A report or backup holding the
+    database therefore delays only the flush, never the checkout.
+
+    Each writer has a journal of its own (dinesight.<id>.journal next to
+    the database) and holds an exclusive lock on it while it runs, so
+    several processes can write to one database. A journal nobody holds
+    (left by a crash, or by a database that stayed locked until close) is
+    taken over and replayed by the next SalesWriter to start; order_ref
+    makes the replay idempotent. A writer only empties or deletes
+    journals it holds the lock on.
+
+    Until an order is flushed its ingredients count as reserved, see
+    pending_demand(). Stock used by another process in the meantime can
+    still make a flushed order short. The sale has been confirmed, so it is
+    recorded anyway, with the stock going below zero, and
+    on_overdrawn(order, ingredient_ids) is called so the stock can be
+    recounted. An order the database cannot record at all (malformed) is
+    dropped and on_rejected(order, reason) is called. order is the
+    journaled order (order_ref, taken_at, lines); both callbacks run on
+    the writer's thread.
+    """
+
+    RETRY_SECONDS = 0.5
+
+    def __init__(
+        self,
+        db_name="dinesight.db",
+        journal_path=None,
+        flush_interval=0.005,
+        max_batch=500,
+        retry_policy=None,
+        on_rejected=None,
+        on_overdrawn=None,
+    ):
+        self.db_name = db_name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.retry_policy = retry_policy
+        self.on_rejected = on_rejected
+        self.on_overdrawn = on_overdrawn
+        self.stats = {
+            "orders": 0,
+            "journal_syncs": 0,
+            "flushes": 0,
+            "recorded": 0,
+            "rejected": 0,
+            "overdrawn": 0,
+            "replayed": 0,
+        }
+        self._cond = threading.Condition()
+        self._buffer = []  # (entry, encoded) waiting for the journal fsync
+        self._pending = []  # journaled entries not yet in the database
+        self._demand = {}  # ingredient_id -> stock reserved by unflushed orders
+        self._syncing = False
+        self._closing = False
+        self._orphans = []  # (file, path) of journals taken over at start-up
+
+        self._journal, self.journal_path = self._open_journal(journal_path)
+        self._replay(self._journal)
+        self._adopt_orphans()
+        self._thread = threading.Thread(
+            target=self._run, name="SalesWriter", daemon=True
+        )
+        self._thread.start()
+
+    def _open_journal(self, journal_path):
+        base = Path(self.db_name)
+        while True:
+            path = journal_path or str(
+                base.with_name(f"{base.stem}.{uuid.uuid4().hex[:12]}.journal")
+            )
+            journal = open(path, "a+b")
+            # A writer starting up at the same moment may take the new,
+            # still unlocked file for an orphan and delete it; keep it only
+            # if it is locked and still on disk.
+            if _try_lock(journal) and _still_linked(journal, path):
+                return journal, path
+            journal.close()
+            if journal_path:
+                raise RuntimeError(f"{journal_path} is in use by another writer")
+
+    def _adopt_orphans(self):
+        """Replay the journals of writers that are no longer running."""
+        base = Path(self.db_name)
+        paths = [base.with_suffix(".journal")]  # from before per-writer journals
+        paths += sorted(base.parent.glob(f"{glob.escape(base.stem)}.*.journal"))
+        for path in paths:
+            if str(path) == self.journal_path:
+                continue
+            try:
+                journal = open(path, "r+b")
+            except OSError:
+                continue
+            if not (_try_lock(journal) and _still_linked(journal, path)):
+                journal.close()  # its writer is still running
+                continue
+            self._replay(journal)
+            self._orphans.append((journal, str(path)))
+
+    def _replay(self, journal):
+        journal.seek(0)
+        for raw in journal:
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                # A line torn by a crash mid-write was never acknowledged.
+                continue
+            entry["demand"] = {int(k): v for k, v in entry["demand"].items()}
+            self._reserve(entry, 1)
+            self._pending.append(entry)
+            self.stats["replayed"] += 1
+
+    @staticmethod
+    def _discard(journal, path):
+        # Emptied before the lock goes, so a writer that grabs the file in
+        # between finds nothing to replay.
+        journal.truncate(0)
+        journal.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _flushed(self):
+        """Everything journaled is in the database; call holding _cond."""
+        self._journal.truncate(0)
+        for journal, path in self._orphans:
+            self._discard(journal, path)
+        self._orphans = []
+
+    def _reserve(self, entry, sign):
+        for ingredient_id, needed in entry["demand"].items():
+            left = self._demand.get(ingredient_id, 0) + sign * needed
+            if sign < 0 and left <= 1e-9:
+                self._demand.pop(ingredient_id, None)
+            else:
+                self._demand[ingredient_id] = left
+
+    # ── Submitting ──────────────────────────────────────────────
+
+    def submit(self, lines, order_ref=None, demand=None):
+        """Journal an order; returns its order_ref once the journal is synced.
+
+        lines are record_order lines; demand ({ingredient_id: needed}, as
+        worked out by the stock check) is reserved until the order is in the
+        database. Raises if the journal cannot be written.
+        """
+        entry = {
+            "order_ref": order_ref or uuid.uuid4().hex,
+            "taken_at": datetime.now().isoformat(sep=" ", timespec="seconds"),
+            "lines": [
+                {
+                    "menu_item_id": line["menu_item_id"],
+                    "quantity": line["quantity"],
+                    "unit_price": line["unit_price"],
+                    "total_amount": line["total_amount"],
+                }
+                for line in lines
+            ],
+            "demand": dict(demand or {}),
+        }
+        encoded = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        state = {"synced": False, "error": None}
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("SalesWriter is closed")
+            self._reserve(entry, 1)
+            self._buffer.append((entry, encoded, state))
+            # Whoever finds no sync running writes and fsyncs everything
+            # buffered so far; the others wait for it and are covered too.
+            while not state["synced"] and state["error"] is None:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                batch, self._buffer = self._buffer, []
+                self._syncing = True
+                self._cond.release()
+                error = None
+                try:
+                    self._journal.write(b"".join(data for _, data, _ in batch))
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+                except Exception as e:
+                    error = e
+                finally:
+                    self._cond.acquire()
+                self._syncing = False
+                for queued, _, queued_state in batch:
+                    if error is None:
+                        queued_state["synced"] = True
+                        self._pending.append(queued)
+                    else:
+                        queued_state["error"] = error
+                        self._reserve(queued, -1)
+                if error is None:
+                    self.stats["orders"] += len(batch)
+                    self.stats["journal_syncs"] += 1
+                self._cond.notify_all()
+        if state["error"] is not None:
+            raise state["error"]
+        return entry["order_ref"]
+
+    @contextmanager
+    def pending_demand(self):
+        """Yields {ingredient_id: quantity} reserved by unflushed orders.
+
+        No batch commits while the block runs (a batch commits and gives up
+        its reservations in one step), so stock read inside it agrees with
+        the reservations. Keep the block short: submit() waits on it too.
+        """
+        with self._cond:
+            yield dict(self._demand)
+
+    def sync(self, timeout=2.0):
+        """Wait until every submitted order is in the database.
+
+        Returns: True if it got there within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._buffer or self._syncing or self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # ── Flushing ────────────────────────────────────────────────
+
+    def _run(self):
+        db = RestaurantDatabaseManager(self.db_name, self.retry_policy)
+        # The journal is emptied once a batch commits, so the commit itself
+        # must survive a power cut, not just an app crash.
+        db.cursor.execute("PRAGMA synchronous = FULL")
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._closing:
+                        self._cond.wait()
+                    if not self._pending:
+                        return
+                    closing = self._closing
+                if not closing:
+                    time.sleep(self.flush_interval)  # let the batch fill up
+                with self._cond:
+                    batch = self._pending[: self.max_batch]
+
+                try:
+                    result = db.record_orders(batch, commit=False)
+                    if result is not None:
+                        # Committed and released in one step, so a stock
+                        # check sees the batch's stock either still
+                        # reserved or already used, never both.
+                        with self._cond:
+                            db.conn.commit()
+                            self._recorded(batch, result)
+                except Exception as e:
+                    # Not down to any one order (those are rejected on
+                    # their own), e.g. a full disk: try again later.
+                    db.conn.rollback()
+                    print(f"Error recording journaled orders: {e}")
+                    result = None
+                if result is None:
+                    # The orders stay journaled.
+                    if closing:
+                        return
+                    time.sleep(self.RETRY_SECONDS)
+                    continue
+                self._report(batch, result)
+        except Exception as e:
+            print(f"Error in sales writer: {e}")
+        finally:
+            db.close()
+
+    def _recorded(self, batch, result):
+        """A batch is committed; call holding _cond."""
+        del self._pending[: len(batch)]
+        for entry in batch:
+            self._reserve(entry, -1)
+        self.stats["flushes"] += 1
+        self.stats["recorded"] += len(batch) - len(result["rejected"])
+        self.stats["rejected"] += len(result["rejected"])
+        self.stats["overdrawn"] += len(result["overdrawn"])
+        if not (self._pending or self._buffer or self._syncing):
+            self._flushed()
+        self._cond.notify_all()
+
+    def _report(self, batch, result):
+        by_ref = {entry["order_ref"]: entry for entry in batch}
+        for order_ref, ingredient_ids in result["overdrawn"]:
+            if self.on_overdrawn:
+                self.on_overdrawn(by_ref.get(order_ref), ingredient_ids)
+            else:
+                print(
+                    f"Order {order_ref} recorded with ingredients "
+                    f"{ingredient_ids} below zero stock"
+                )
+        for order_ref, reason in result["rejected"]:
+            if self.on_rejected:
+                self.on_rejected(by_ref.get(order_ref), reason)
+            else:
+                print(f"Order {order_ref} not recorded: {reason}")
+
+    def close(self, timeout=10.0):
+        """Stop taking orders and flush what is journaled.
+
+        Anything not in the database after timeout seconds stays in the
+        journal for the next start; otherwise the journal is deleted.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            unflushed = self._pending or self._buffer or self._syncing
+            if self._thread.is_alive() or unflushed:
+                for journal, _ in self._orphans:
+                    journal.close()
+                self._journal.close()
+            else:
+                self._flushed()
+                self._discard(self._journal, self.journal_path)
@@ -3,20 +3,57 @@ from tkinter import ttk
 from datetime import datetime, timedelta
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+from RestaurantDatabaseManager import format_money
 
 
 class TrendsAnalysis(tk.Frame):
-    def __init__(self, parent, colors):
+    def __init__(self, parent, colors, db, worker):
         super().__init__(parent, bg=colors['background'])
-        self.db = RestaurantDatabaseManager()
+        self.db = db
         self.colors = colors
+        self.data = None
+        self.build_header()
+
+        # The queries run on the DB worker; the page fills in when they land.
+        self.loading_label = tk.Label(self, text="Loading trends...", bg=colors['background'],
+                                      fg=colors['text_muted'], font=("Segoe UI", 11))
+        self.loading_label.pack(expand=True, pady=60)
+        worker.call(self.load_data, on_done=self.show_data, on_error=self.show_error,
+                    owner=self)
+
+    @staticmethod
+    def load_data(db):
+        # Runs on the worker thread with the worker's own manager.
+        now = datetime.now()
+        d30 = (now - timedelta(days=30)).strftime("%Y-%m-%d")
+        d60 = (now - timedelta(days=60)).strftime("%Y-%m-%d")
+        tomorrow = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+        return {
+            'hourly': db.get_hourly_sales_pattern(),
+            # One pass over the daily rollup, grouped by weekday, shared by
+            # the best-day insight and the weekly chart.
+            'weekday_revenue': {
+                day: revenue for day, _, revenue in db.get_weekday_sales_pattern()
+            },
+            'top_items': db.get_top_items(5),
+            'avg_order': db.get_average_order_value(),
+            'recent_revenue': db.get_period_summary(date_range=(d30, tomorrow))['revenue'],
+            'previous_revenue': db.get_period_summary(date_range=(d60, d30))['revenue'],
+        }
+
+    def show_data(self, data):
+        self.data = data
+        self.loading_label.destroy()
         self.build_ui()
 
-    def build_ui(self):
+    def show_error(self, error):
+        self.loading_label.config(text="Could not load trends: {}".format(error),
+                                  fg=self.colors['error'])
+
+    def build_header(self):
         c = self.colors
 
-        # Header
         header = tk.Frame(self, bg=c['background'])
         header.pack(fill="x", pady=(0, 24))
 
@@ -26,6 +63,9 @@ class TrendsAnalysis(tk.Frame):
                  bg=c['background'], fg=c['text_secondary'],
                  font=("Segoe UI", 11)).pack(anchor="w", pady=(4, 0))
 
+    def build_ui(self):
+        c = self.colors
+
         # Insight cards row
         self.build_insights_row()
 
@@ -55,7 +95,7 @@ class TrendsAnalysis(tk.Frame):
         cards = [
             ("Peak Hour", insights['peak_hour'], "Busiest time", c['warning']),
             ("Best Day", insights['best_day'], "Highest revenue", c['success']),
-            ("Avg Order Value", "${:.2f}".format(insights['avg_order']), "Per transaction", c['accent']),
+            ("Avg Order Value", format_money(insights['avg_order']), "Per transaction", c['accent']),
             ("Growth Trend", "{:+.1f}%".format(insights['growth']), "vs previous period",
              c['success'] if insights['growth'] >= 0 else c['error']),
         ]
@@ -82,7 +122,7 @@ class TrendsAnalysis(tk.Frame):
 
     def _calculate_insights(self):
         # Peak hour
-        hourly = self.db.get_hourly_sales_pattern()
+        hourly = self.data['hourly']
         peak_hour = "N/A"
         if hourly:
             best = max(hourly, key=lambda x: x[1])
@@ -91,34 +131,18 @@ class TrendsAnalysis(tk.Frame):
             peak_hour = str(h % 12 or 12) + " " + ampm
 
         # Best day
-        sales = self.db.get_sales_data()
-        daily_totals = {}
-        for s in sales:
-            daily_totals[s[8]] = daily_totals.get(s[8], 0) + s[5]
+        daily_totals = self.data['weekday_revenue']
         best_day = max(daily_totals.items(), key=lambda x: x[1])[0] if daily_totals else "N/A"
 
-        # Avg order value
-        total = sum(s[5] for s in sales)
-        avg_order = total / len(sales) if sales else 0
+        # Avg order value, per order rather than per line item
+        avg_order = self.data['avg_order']
 
         # Growth trend: compare last 30 days vs previous 30 days
         growth = 0.0
-        try:
-            now = datetime.now()
-            d30 = (now - timedelta(days=30)).strftime("%Y-%m-%d")
-            d60 = (now - timedelta(days=60)).strftime("%Y-%m-%d")
-            today = now.strftime("%Y-%m-%d")
-
-            recent = self.db.get_sales_data(date_range=[d30, today])
-            previous = self.db.get_sales_data(date_range=[d60, d30])
-
-            recent_rev = sum(s[5] for s in recent) if recent else 0
-            prev_rev = sum(s[5] for s in previous) if previous else 0
-
-            if prev_rev > 0:
-                growth = ((recent_rev - prev_rev) / prev_rev) * 100
-        except Exception:
-            pass
+        recent_rev = self.data['recent_revenue']
+        prev_rev = self.data['previous_revenue']
+        if prev_rev > 0:
+            growth = ((recent_rev - prev_rev) / prev_rev) * 100
 
         return {
             'peak_hour': peak_hour,
@@ -141,7 +165,7 @@ class TrendsAnalysis(tk.Frame):
         canvas_frame = tk.Frame(card, bg=c['surface'])
         canvas_frame.pack(fill="both", expand=True, padx=16, pady=(0, 16))
 
-        hourly = self.db.get_hourly_sales_pattern()
+        hourly = self.data['hourly']
         if not hourly:
             tk.Label(canvas_frame, text="No hourly data available",
                      bg=c['surface'], fg=c['text_muted'],
@@ -191,18 +215,13 @@ class TrendsAnalysis(tk.Frame):
         content = tk.Frame(card, bg=c['surface'])
         content.pack(fill="both", expand=True, padx=20, pady=(0, 16))
 
-        sales = self.db.get_sales_data()
-        if not sales:
+        top = self.data['top_items']
+        if not top:
             tk.Label(content, text="No sales data yet",
                      bg=c['surface'], fg=c['text_muted'],
                      font=("Segoe UI", 11)).pack(expand=True, pady=40)
             return
 
-        quantities = {}
-        for s in sales:
-            quantities[s[1]] = quantities.get(s[1], 0) + s[3]
-
-        top = sorted(quantities.items(), key=lambda x: x[1], reverse=True)[:5]
         max_qty = top[0][1] if top else 1
 
         medal_colors = ['#f59e0b', '#94a3b8', '#b45309']
@@ -250,20 +269,17 @@ class TrendsAnalysis(tk.Frame):
         canvas_frame = tk.Frame(card, bg=c['surface'])
         canvas_frame.pack(fill="both", expand=True, padx=16, pady=(0, 16))
 
-        sales = self.db.get_sales_data()
-        if not sales:
+        daily = self.data['weekday_revenue']
+        if not daily:
             tk.Label(canvas_frame, text="No weekly data available",
                      bg=c['surface'], fg=c['text_muted'],
                      font=("Segoe UI", 11)).pack(expand=True, pady=40)
             return
 
         days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        daily = {}
-        for s in sales:
-            daily[s[8]] = daily.get(s[8], 0) + s[5]
 
         days = [d for d in days_order if d in daily]
-        amounts = [daily.get(d, 0) for d in days]
+        amounts = [daily.get(d, 0) / 100 for d in days]
 
         fig = Figure(figsize=(10, 3), dpi=100)
         fig.patch.set_facecolor(c['surface'])
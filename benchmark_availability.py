@@ -0,0 +1,94 @@
+"""Benchmark the menu-availability refresh against the old per-item loop.
+
+Builds a throwaway database with 1,000 menu items x 10 ingredients each and
+times the old Python loop (one recipe query plus one inventory lookup per
+ingredient, per item) against the set-based UPDATE now used by
+check_and_update_all_menu_availability.
+
+    python benchmark_availability.py [--items 1000] [--ingredients 10]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+
+def seed(db, n_items, per_item, n_ingredients, rng):
+    db.cursor.executemany(
+        "INSERT INTO inventory (ingredient_name, current_stock, unit, minimum_threshold) "
+        "VALUES (?, ?, 'unit', 5)",
+        [("Ingredient {}".format(i), rng.uniform(0, 50)) for i in range(n_ingredients)],
+    )
+    db.cursor.executemany(
+        "INSERT INTO menu_items (name, category, price, cost, is_available) "
+        "VALUES (?, 'Main', 1000, 400, 1)",
+        [("Item {}".format(i),) for i in range(n_items)],
+    )
+    db.cursor.executemany(
+        "INSERT INTO recipes (menu_item_id, ingredient_id, quantity_used) VALUES (?, ?, ?)",
+        [
+            (item_id, ingredient_id, rng.uniform(0.5, 5))
+            for item_id in range(1, n_items + 1)
+            for ingredient_id in rng.sample(range(1, n_ingredients + 1), per_item)
+        ],
+    )
+    db.conn.commit()
+
+
+def legacy_refresh(db):
+    """The pre-set-based implementation, kept here only for comparison."""
+    for item in db.get_menu_items():
+        can_make = True
+        for _, ingredient_id, _, quantity_used, _ in db.get_recipe_for_item(item[0]):
+            ingredient = db.get_inventory_item_by_id(ingredient_id)
+            if not ingredient or ingredient[2] < quantity_used:
+                can_make = False
+                break
+        if bool(item[7]) != can_make:
+            db.update_menu_item_availability(item[0], can_make)
+    db.conn.commit()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--ingredients", type=int, default=10, help="per menu item")
+    parser.add_argument("--pantry", type=int, default=300, help="distinct ingredients")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = RestaurantDatabaseManager(os.path.join(tmp, "bench.db"))
+        seed(db, args.items, args.ingredients, args.pantry, random.Random(args.seed))
+
+        legacy = best_of(lambda: legacy_refresh(db), args.repeat)
+        legacy_state = db.get_menu_items()
+        db.cursor.execute("UPDATE menu_items SET is_available = 1 - is_available")
+        db.conn.commit()
+        set_based = best_of(db.check_and_update_all_menu_availability, args.repeat)
+        agree = legacy_state == db.get_menu_items()
+        db.close()
+
+    print("{} menu items x {} ingredients".format(args.items, args.ingredients))
+    print("  python loop : {:8.1f} ms".format(legacy * 1000))
+    print("  set-based   : {:8.1f} ms".format(set_based * 1000))
+    print("  speed-up    : {:8.1f}x".format(legacy / set_based if set_based else 0))
+    print("  same result : {}".format("yes" if agree else "NO"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Time RestaurantDatabaseManager methods on generated workloads.
+
+For each size a workload is generated with generate_workload.py (cached in
+bench_data/ for the day) and copied to a scratch file, then each entry in
+BENCHMARKS gets one warm-up call and --repeat timed calls. Results (best,
+median and worst of the runs) are written as JSON. With --baseline the run
+is compared against an earlier results file and fails if any method's best
+time got more than --threshold slower (and by more than a millisecond).
+
+    python benchmark_database.py [--sizes 10k,1m,10m] [--repeat 5]
+                                 [--out benchmark_results.json]
+                                 [--baseline benchmark_baseline.json]
+                                 [--threshold 0.25] [--save-baseline]
+
+Baselines are machine-specific: record one on the machine you compare on.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from generate_workload import generate, parse_count
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data")
+NOISE_MS = 1.0
+
+
+def context(db):
+    """Keys and date ranges the benchmarks use, taken from the workload."""
+    last_day = date.fromisoformat(db.get_revenue_by_period("daily")[-1][0])
+    newest = db.get_sales_page(1)[0]
+    return {
+        "last_day": last_day,
+        "week": ((last_day - timedelta(days=6)).isoformat(), last_day.isoformat()),
+        "month": ((last_day - timedelta(days=29)).isoformat(), last_day.isoformat()),
+        "quarter": ((last_day - timedelta(days=89)).isoformat(), last_day.isoformat()),
+        "page_key": db.sale_key(db.get_sales_page(100)[-1]),
+        "line": {
+            "menu_item_id": newest[12],
+            "quantity": 1,
+            "unit_price": newest[4],
+            "total_amount": newest[4],
+        },
+    }
+
+
+def import_rows(ctx, n=500):
+    day = ctx["last_day"].isoformat()
+    return [
+        {
+            "order_id": i // 2,
+            "item_name": "Benchmark item",
+            "category": "Mains",
+            "quantity": 1,
+            "unit_price": "9.50",
+            "total_amount": "9.50",
+            "order_date": day,
+            "order_time": "23:{:02d}:{:02d}".format(i // 60 % 60, i % 60),
+        }
+        for i in range(n)
+    ]
+
+
+# (label, call, repeat) -- repeat None uses --repeat. Reads first, then
+# writes, so the reads see the workload exactly as generated.
+BENCHMARKS = [
+    ("get_sales_summary", lambda db, c: db.get_sales_summary(), None),
+    (
+        "get_period_summary[month]",
+        lambda db, c: db.get_period_summary(date_range=c["month"]),
+        None,
+    ),
+    ("get_daily_sales_trend", lambda db, c: db.get_daily_sales_trend(30), None),
+    (
+        "get_revenue_by_period[daily]",
+        lambda db, c: db.get_revenue_by_period("daily", c["quarter"]),
+        None,
+    ),
+    (
+        "get_revenue_by_period[monthly]",
+        lambda db, c: db.get_revenue_by_period("monthly"),
+        None,
+    ),
+    (
+        "get_revenue_by_period[yearly]",
+        lambda db, c: db.get_revenue_by_period("yearly"),
+        None,
+    ),
+    ("get_category_performance", lambda db, c: db.get_category_performance(), None),
+    ("get_hourly_sales_pattern", lambda db, c: db.get_hourly_sales_pattern(), None),
+    ("get_weekday_sales_pattern", lambda db, c: db.get_weekday_sales_pattern(), None),
+    ("get_top_items", lambda db, c: db.get_top_items(), None),
+    ("get_popular_item", lambda db, c: db.get_popular_item(), None),
+    (
+        "get_average_order_value",
+        lambda db, c: db.get_average_order_value(c["month"]),
+        None,
+    ),
+    ("get_sales_page[first]", lambda db, c: db.get_sales_page(100), None),
+    (
+        "get_sales_page[next]",
+        lambda db, c: db.get_sales_page(100, c["page_key"]),
+        None,
+    ),
+    ("get_sales_since", lambda db, c: db.get_sales_since(c["page_key"]), None),
+    ("get_sales_data[week]", lambda db, c: db.get_sales_data(c["week"]), None),
+    (
+        "get_sales_data[month, category]",
+        lambda db, c: db.get_sales_data(c["month"], "Mains"),
+        None,
+    ),
+    (
+        "iter_sales[month]",
+        lambda db, c: sum(1 for _ in db.iter_sales(c["month"])),
+        None,
+    ),
+    (
+        "iter_sales_columns[quarter]",
+        lambda db, c: list(
+            db.iter_sales_columns(["order_date", "total_amount"], c["quarter"])
+        ),
+        None,
+    ),
+    ("get_menu_items", lambda db, c: db.get_menu_items(), None),
+    ("get_inventory", lambda db, c: db.get_inventory(), None),
+    ("get_recipe_for_item", lambda db, c: db.get_recipe_for_item(1), None),
+    (
+        "get_menu_items_using_ingredients",
+        lambda db, c: db.get_menu_items_using_ingredients([1, 2, 3]),
+        None,
+    ),
+    (
+        "check_stock_for_order",
+        lambda db, c: db.check_stock_for_order([c["line"]] * 3),
+        None,
+    ),
+    ("record_sale", lambda db, c: db.record_sale(1, "", "", 1, 950, 950), None),
+    ("record_order", lambda db, c: db.record_order([c["line"]] * 3), None),
+    ("checkout_order", lambda db, c: db.checkout_order([c["line"]] * 2), None),
+    (
+        "check_and_update_all_menu_availability",
+        lambda db, c: db.check_and_update_all_menu_availability(),
+        None,
+    ),
+    (
+        "update_menu_availability_for_ingredients",
+        lambda db, c: db.update_menu_availability_for_ingredients([1, 2, 3]),
+        None,
+    ),
+    ("import_sales[500]", lambda db, c: db.import_sales(import_rows(c)), 3),
+    ("rebuild_sales_rollups", lambda db, c: db.rebuild_sales_rollups(), 1),
+]
+
+
+def workload(rows, seed, regenerate=False):
+    """Path of the cached workload for this size and seed, generated if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    prefix = f"workload_{rows}_seed{seed}_"
+    path = os.path.join(DATA_DIR, f"{prefix}{date.today().isoformat()}.db")
+    if regenerate or not os.path.exists(path):
+        # Workloads end today, so yesterday's files are stale.
+        for name in os.listdir(DATA_DIR):
+            if name.startswith(prefix):
+                os.remove(os.path.join(DATA_DIR, name))
+
+        def progress(done, seconds):
+            print(f"\r  generating: {done:,} rows", end="", flush=True)
+
+        if generate(path, rows, seed=seed, progress=progress) is None:
+            raise RuntimeError("workload generation failed")
+        print()
+    return path
+
+
+def run_size(rows, seed, repeat, regenerate=False):
+    source = workload(rows, seed, regenerate)
+    scratch = os.path.join(DATA_DIR, "scratch.db")
+    shutil.copyfile(source, scratch)
+    db = RestaurantDatabaseManager(scratch)
+    try:
+        ctx = context(db)
+        results = {}
+        for label, call, runs in BENCHMARKS:
+            call(db, ctx)  # warm-up
+            timings = []
+            for _ in range(runs or repeat):
+                start = time.perf_counter()
+                call(db, ctx)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = {
+                "runs": len(timings),
+                "median_ms": round(statistics.median(timings), 3),
+                "min_ms": round(min(timings), 3),
+                "max_ms": round(max(timings), 3),
+            }
+            print(
+                "  {:<42} {:>10.2f} ms  (median {:.2f})".format(
+                    label, results[label]["min_ms"], results[label]["median_ms"]
+                )
+            )
+        return results
+    finally:
+        db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(scratch + suffix):
+                os.remove(scratch + suffix)
+
+
+def compare(baseline, results, threshold):
+    """Returns: list of (size, label, baseline_ms, now_ms) regressions."""
+    regressions = []
+    for size, methods in results["sizes"].items():
+        before = baseline["sizes"].get(size, {})
+        for label, now in methods.items():
+            if label not in before:
+                continue
+            # Best-of-N is the least noisy figure on a busy machine.
+            old_ms, new_ms = before[label]["min_ms"], now["min_ms"]
+            if new_ms > old_ms * (1 + threshold) and new_ms - old_ms > NOISE_MS:
+                regressions.append((size, label, old_ms, new_ms))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", default="10k,1m,10m", help="sales lines per workload"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per method")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="also write results to --baseline"
+    )
+    parser.add_argument(
+        "--regenerate", action="store_true", help="rebuild cached workloads"
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "sqlite_version": sqlite3.sqlite_version,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    for size in args.sizes.split(","):
+        rows = parse_count(size)
+        print(f"{size.strip()} rows")
+        results["sizes"][size.strip()] = run_size(
+            rows, args.seed, args.repeat, args.regenerate
+        )
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline or not os.path.exists(args.baseline):
+        shutil.copyfile(args.out, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, args.threshold)
+    for size, label, old_ms, new_ms in regressions:
+        print(
+            f"REGRESSION {size} {label}: {old_ms:.2f} ms -> {new_ms:.2f} ms "
+            f"(+{(new_ms / old_ms - 1) if old_ms else 0:.0%})"
+        )
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+"""Check that every RestaurantDatabaseManager query keeps its query plan.
+
+Seeds a throwaway database (three years of sales, the oldest archived),
+calls every public method, captures each SQL statement it runs and records
+its EXPLAIN QUERY PLAN. The plans are compared with the checked-in baseline
+in query_plans.json: any change fails the check, and a full table SCAN
+where the baseline had an index SEARCH is called out as a lost index. A
+new public method must be added to CALLS below before the check passes.
+
+Independently of the baseline, the statements of the checkout path
+(HOT_METHODS) must reach every table through an index: a SCAN of one of
+HOT_TABLES there fails the check, and --update refuses to record it.
+
+    python check_query_plans.py            # compare, exit 1 on any change
+    python check_query_plans.py --update   # accept the current plans
+
+Review the baseline diff when updating: it is the record of which scans
+are intended.
+"""
+
+import argparse
+import inspect
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from QueryProfiler import QueryProfiler, normalize_sql
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plans.json")
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+# Sized like a real menu: the planner only prefers an index over a scan
+# once the tables (and their ANALYZE statistics) are big enough to matter.
+INGREDIENTS = 150
+MENU_ITEMS = 300
+RECIPE_SIZE = 6
+SOLD_ITEMS = 40  # the items that have sales history
+
+# Run on every checkout, so each must stay a handful of index lookups.
+HOT_METHODS = (
+    "check_stock_for_order",
+    "checkout_order",
+    "record_order",
+    "record_orders",
+    "record_sale",
+)
+HOT_TABLES = {"inventory", "i", "menu_items", "recipes", "r", "orders", "order_lines"}
+
+
+class PlanRecorder(QueryProfiler):
+    """Captures the plan of every statement run while `method` is set."""
+
+    def __init__(self):
+        super().__init__(slow_ms=float("inf"), log_path=os.devnull)
+        self.method = None
+        self.plans = {}
+
+    def on_execute(self, conn, sql, params):
+        if self.method is None or sql.split()[0].upper() not in EXPLAINED:
+            return
+        if params is None:
+            params = (None,) * sql.count("?")  # executemany: plan only
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        depth = {0: -1}
+        lines = []
+        for node, parent, _, detail in plan:
+            depth[node] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node] + normalize_sql(detail))
+        # Each distinct statement once per method, in the order first run.
+        self.plans.setdefault(self.method, {}).setdefault(normalize_sql(sql), lines)
+
+
+def seed(db, rng, today):
+    for i in range(INGREDIENTS):
+        db.add_inventory_item(f"Ingredient {i}", 500, "unit", 5, 0.25, "Supplier", "")
+    categories = ["Main", "Side", "Beverage", "Dessert"]
+    for i in range(MENU_ITEMS):
+        price = rng.randrange(300, 2500, 50)
+        db.add_menu_item(f"Item {i}", categories[i % 4], "", price, price // 3, 10)
+        for ingredient_id in rng.sample(range(1, INGREDIENTS + 1), RECIPE_SIZE):
+            db.add_recipe_item(i + 1, ingredient_id, 1)
+
+    rows = []
+    day = date(today.year - 2, 1, 1)
+    while day < today:
+        for _ in range(rng.randint(5, 15)):
+            item = rng.randrange(SOLD_ITEMS)
+            quantity = rng.randint(1, 3)
+            price = db.get_menu_item_by_id(item + 1)[4] / 100
+            hour, minute = rng.randint(9, 22), rng.randint(0, 59)
+            rows.append(
+                {
+                    "item_name": f"Item {item}",
+                    "category": categories[item % 4],
+                    "quantity": quantity,
+                    "unit_price": price,
+                    "total_amount": price * quantity,
+                    "order_date": day.isoformat(),
+                    "order_time": f"{hour:02d}:{minute:02d}:00",
+                }
+            )
+        day += timedelta(days=1)
+    db.import_sales(rows)
+    # A long-running database has planner statistics (close() runs
+    # PRAGMA optimize); plans are checked with them in place.
+    db.conn.execute("ANALYZE")
+    db.conn.commit()
+
+
+def calls(workdir, today):
+    """(method, call) pairs, run in order; together they cover every method."""
+    this_year = (f"{today.year}-01-01", today.isoformat())
+    last_year = (f"{today.year - 1}-01-01", f"{today.year - 1}-12-31")
+    spanning = (f"{today.year - 2}-06-01", f"{today.year - 1}-06-30")
+    line = {"menu_item_id": 1, "quantity": 1, "unit_price": 500, "total_amount": 500}
+    spare_ingredient = INGREDIENTS + 1
+    spare_item = MENU_ITEMS + 1
+    return [
+        ("create_tables", lambda db: db.create_tables()),
+        ("get_schema_version", lambda db: db.get_schema_version()),
+        ("migrate", lambda db: db.migrate()),
+        ("repair_sales_triggers", lambda db: db.repair_sales_triggers()),
+        ("archive_year", lambda db: db.archive_year(today.year - 2)),
+        ("get_archives", lambda db: db.get_archives()),
+        ("get_inventory_item_by_id", lambda db: db.get_inventory_item_by_id(1)),
+        (
+            "add_inventory_item",
+            lambda db: db.add_inventory_item("Spare", 1, "kg", 2, 1.5, "", ""),
+        ),
+        (
+            "update_inventory_item",
+            lambda db: db.update_inventory_item(
+                spare_ingredient, "Spare", 9, "kg", 2, 1.5, "", ""
+            ),
+        ),
+        (
+            "delete_inventory_item",
+            lambda db: db.delete_inventory_item(spare_ingredient),
+        ),
+        ("get_inventory", lambda db: db.get_inventory()),
+        ("get_inventory", lambda db: db.get_inventory(low_stock_only=True)),
+        # These two leave the commit to the caller.
+        (
+            "update_inventory_stock",
+            lambda db: (db.update_inventory_stock(1, 400), db.conn.commit()),
+        ),
+        ("add_menu_item", lambda db: db.add_menu_item("Spare", "Main", "", 100, 50, 1)),
+        ("get_menu_items", lambda db: db.get_menu_items()),
+        ("get_menu_items", lambda db: db.get_menu_items(available_only=True)),
+        ("get_menu_item_by_id", lambda db: db.get_menu_item_by_id(1)),
+        (
+            "update_menu_item",
+            lambda db: db.update_menu_item(
+                spare_item, "Spare", "Main", "", 120, 50, 1, True
+            ),
+        ),
+        ("delete_menu_item", lambda db: db.delete_menu_item(spare_item)),
+        ("delete_menu_item", lambda db: db.delete_menu_item(2)),  # has sales: retired
+        (
+            "update_menu_item_availability",
+            lambda db: (db.update_menu_item_availability(3, True), db.conn.commit()),
+        ),
+        ("record_sale", lambda db: db.record_sale(1, "Item 0", "Main", 1, 500, 500)),
+        (
+            "record_order",
+            lambda db: db.record_order([line, dict(line, menu_item_id=5)]),
+        ),
+        (
+            "record_orders",
+            lambda db: db.record_orders(
+                [
+                    {
+                        "order_ref": "plan-check",
+                        "taken_at": f"{today.isoformat()} 12:00:00",
+                        "lines": [line],
+                    },
+                    {
+                        "order_ref": "plan-check-short",
+                        "taken_at": f"{today.isoformat()} 12:00:00",
+                        "lines": [dict(line, quantity=10_000)],
+                    },
+                ]
+            ),
+        ),
+        # The short order above overdrew its ingredients; restock them all.
+        (
+            "update_inventory_stock",
+            lambda db: (
+                [db.update_inventory_stock(i, 500) for i in range(1, INGREDIENTS + 1)],
+                db.conn.commit(),
+            ),
+        ),
+        (
+            "import_sales",
+            lambda db: db.import_sales(
+                [
+                    {
+                        "item_name": "Item 3",
+                        "category": "Dessert",
+                        "quantity": 1,
+                        "unit_price": 4.5,
+                        "total_amount": 4.5,
+                        "order_date": today.isoformat(),
+                        "order_time": "12:00:00",
+                    }
+                ]
+            ),
+        ),
+        ("get_sales_data", lambda db: db.get_sales_data()),
+        ("get_sales_data", lambda db: db.get_sales_data(this_year)),
+        ("get_sales_data", lambda db: db.get_sales_data(spanning, "Main")),
+        ("iter_sales", lambda db: list(db.iter_sales(last_year))),
+        (
+            "iter_sales_columns",
+            lambda db: list(
+                db.iter_sales_columns(["order_date", "total_amount"], spanning)
+            ),
+        ),
+        ("get_top_items", lambda db: db.get_top_items()),
+        ("get_sales_page", lambda db: db.get_sales_page()),
+        (
+            "get_sales_page",
+            lambda db: db.get_sales_page(after=(db.get_sales_page(1)[0][13], 1)),
+        ),
+        (
+            "get_sales_since",
+            lambda db: db.get_sales_since(db.sale_key(db.get_sales_page(50)[-1])),
+        ),
+        ("get_period_summary", lambda db: db.get_period_summary("today")),
+        ("get_period_summary", lambda db: db.get_period_summary("year")),
+        ("get_popular_item", lambda db: db.get_popular_item()),
+        ("get_average_order_value", lambda db: db.get_average_order_value()),
+        ("get_average_order_value", lambda db: db.get_average_order_value(last_year)),
+        (
+            "get_sales_summary",
+            lambda db: db.get_sales_summary(("today", "week", "month")),
+        ),
+        ("rebuild_sales_rollups", lambda db: db.rebuild_sales_rollups()),
+        ("get_category_performance", lambda db: db.get_category_performance()),
+        ("get_hourly_sales_pattern", lambda db: db.get_hourly_sales_pattern()),
+        ("get_weekday_sales_pattern", lambda db: db.get_weekday_sales_pattern()),
+        ("get_daily_sales_trend", lambda db: db.get_daily_sales_trend(30)),
+        (
+            "get_revenue_by_period",
+            lambda db: db.get_revenue_by_period("daily", last_year),
+        ),
+        ("get_revenue_by_period", lambda db: db.get_revenue_by_period("monthly")),
+        ("get_revenue_by_period", lambda db: db.get_revenue_by_period("yearly")),
+        ("add_recipe_item", lambda db: db.add_recipe_item(1, INGREDIENTS, 1)),
+        ("get_recipe_for_item", lambda db: db.get_recipe_for_item(1)),
+        (
+            "get_menu_items_using_ingredients",
+            lambda db: db.get_menu_items_using_ingredients([1, 2, 3]),
+        ),
+        (
+            "delete_recipe_item",
+            lambda db: db.delete_recipe_item(db.get_recipe_for_item(1)[-1][0]),
+        ),
+        ("check_stock_for_order", lambda db: db.check_stock_for_order([line])),
+        ("checkout_order", lambda db: db.checkout_order([line])),
+        ("check_stock_for_sale", lambda db: db.check_stock_for_sale(1, 2)),
+        (
+            "update_menu_availability_for_ingredients",
+            lambda db: db.update_menu_availability_for_ingredients([1, 2]),
+        ),
+        (
+            "check_and_update_all_menu_availability",
+            lambda db: db.check_and_update_all_menu_availability(),
+        ),
+        ("backup", lambda db: db.backup(os.path.join(workdir, "backups"))),
+        ("close", lambda db: db.close()),
+    ]
+
+
+def public_methods():
+    return {
+        name
+        for name, attr in vars(RestaurantDatabaseManager).items()
+        if not name.startswith("_") and inspect.isfunction(attr)
+    }
+
+
+def record_plans(workdir):
+    today = date.today()
+    db = RestaurantDatabaseManager(os.path.join(workdir, "plans.db"))
+    seed(db, random.Random(7), today)
+    recorder = PlanRecorder()
+    recorder.attach(db)
+    for method, call in calls(workdir, today):
+        recorder.method = method
+        call(db)
+    recorder.method = None
+    return recorder.plans
+
+
+def lost_indexes(old_plan, new_plan):
+    """Lines of new_plan that SCAN a table old_plan reached with a SEARCH."""
+    searched = {line.split()[1] for line in old_plan if line.split()[0] == "SEARCH"}
+    return [
+        line
+        for line in new_plan
+        if line.split()[0] == "SCAN" and line.split()[1] in searched
+    ]
+
+
+def hot_scans(plans):
+    """Returns: "method: statement" problems for HOT_METHODS that scan a table."""
+    problems = []
+    for method in HOT_METHODS:
+        for sql, plan in plans.get(method, {}).items():
+            scans = [
+                line.strip()
+                for line in plan
+                if line.split()[0] == "SCAN" and line.split()[1] in HOT_TABLES
+            ]
+            if scans:
+                problems.append(
+                    f"{method}: TABLE SCAN on the checkout path:\n" + describe(sql, plan)
+                )
+    return problems
+
+
+def describe(sql, plan, label="plan"):
+    return f"    {sql}\n  {label}:\n" + "\n".join("    " + line for line in plan)
+
+
+def compare(baseline, plans):
+    """Returns: list of human-readable differences."""
+    problems = []
+    for method in sorted(set(baseline) | set(plans)):
+        old = {entry["sql"]: entry["plan"] for entry in baseline.get(method, [])}
+        new = plans.get(method, {})
+        for sql in old.keys() & new.keys():
+            if old[sql] != new[sql]:
+                lost = lost_indexes(old[sql], new[sql])
+                problems.append(
+                    f"{method}: {'LOST INDEX' if lost else 'plan changed'}:\n"
+                    + describe(sql, old[sql], "baseline")
+                    + "\n  now:\n"
+                    + "\n".join("    " + line for line in new[sql])
+                )
+        # Statements that were rewritten: pair them up in the order they run.
+        gone = [sql for sql in old if sql not in new]
+        added = [sql for sql in new if sql not in old]
+        for old_sql, new_sql in zip(gone, added):
+            lost = lost_indexes(old[old_sql], new[new_sql])
+            problems.append(
+                f"{method}: statement rewritten{', LOST INDEX' if lost else ''}:\n"
+                + describe(old_sql, old[old_sql], "baseline plan")
+                + "\n  now:\n"
+                + describe(new_sql, new[new_sql])
+            )
+        for sql in gone[len(added) :]:
+            problems.append(f"{method}: statement no longer run:\n    {sql}")
+        for sql in added[len(gone) :]:
+            problems.append(f"{method}: new statement:\n" + describe(sql, new[sql]))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--update", action="store_true", help="rewrite query_plans.json"
+    )
+    args = parser.parse_args(argv)
+
+    missing = public_methods() - {method for method, _ in calls("", date.today())}
+    if missing:
+        print("Add these methods to CALLS in check_query_plans.py:")
+        for name in sorted(missing):
+            print("  " + name)
+        return 1
+
+    with tempfile.TemporaryDirectory() as workdir:
+        plans = record_plans(workdir)
+
+    scans = hot_scans(plans)
+    for problem in scans:
+        print(problem + "\n")
+
+    if args.update:
+        if scans:
+            print(f"Not updating {BASELINE}: fix the scans above first")
+            return 1
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            methods = {
+                method: [{"sql": sql, "plan": plan} for sql, plan in statements.items()]
+                for method, statements in sorted(plans.items())
+            }
+            json.dump(
+                {"sqlite_version": sqlite3.sqlite_version, "methods": methods},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Wrote plans for {len(plans)} methods to {BASELINE}")
+        return 0
+
+    with open(BASELINE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["sqlite_version"] != sqlite3.sqlite_version:
+        print(
+            f"Note: baseline was recorded with SQLite {baseline['sqlite_version']}, "
+            f"this is {sqlite3.sqlite_version}; planner changes may show up below."
+        )
+    problems = compare(baseline["methods"], plans)
+    for problem in problems:
+        print(problem + "\n")
+    problems += scans
+    statements = sum(len(statements) for statements in plans.values())
+    if problems:
+        print(f"{len(problems)} plan difference(s) in {statements} statements")
+        return 1
+    print(f"All {statements} statement plans match the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Maintenance commands for a DineSight database.
+
+    python db_admin.py [--db dinesight.db] rebuild-rollups
+    python db_admin.py [--db dinesight.db] import sales.csv [--batch-size N]
+    python db_admin.py [--db dinesight.db] archive [YEAR ...]
+    python db_admin.py [--db dinesight.db] backup [--dir backups] [--keep N]
+
+Add --profile FILE to write per-method and per-query timings as JSON.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from QueryProfiler import QueryProfiler
+from RestaurantDatabaseManager import RestaurantDatabaseManager, format_money
+
+
+def cmd_rebuild_rollups(db, args):
+    start = time.perf_counter()
+    if not db.rebuild_sales_rollups():
+        return 1
+    print("Rebuilt sales rollups in {:.2f}s".format(time.perf_counter() - start))
+    return 0
+
+
+def read_sales_file(path):
+    """Yield sales rows as dicts from a CSV (with a header row) or JSON-lines file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson", ".json"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def cmd_import(db, args):
+    def progress(rows, seconds):
+        print(
+            "\r  {:,} rows  {:,.0f} rows/s".format(rows, rows / seconds if seconds else 0),
+            end="",
+            flush=True,
+        )
+
+    stats = db.import_sales(
+        read_sales_file(args.file), batch_size=args.batch_size, progress=progress
+    )
+    print()
+    if stats is None:
+        return 1
+    print(
+        "Imported {:,} rows as {:,} orders in {:.1f}s ({:,.0f} rows/s); "
+        "skipped {:,}".format(
+            stats["rows"],
+            stats["orders"],
+            stats["seconds"],
+            stats["rows"] / stats["seconds"] if stats["seconds"] else 0,
+            stats["skipped"],
+        )
+    )
+    return 0
+
+
+def database_size(db, path):
+    # Fold the WAL into the main file first; whatever a reader kept from
+    # being truncated still counts, so the two sizes compare like for like.
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    wal = path + "-wal"
+    return os.path.getsize(path) + (os.path.getsize(wal) if os.path.exists(wal) else 0)
+
+
+def cmd_archive(db, args):
+    if not args.years:
+        for year, file_name, orders, lines, revenue, archived_at in db.get_archives():
+            print(
+                "{}  {}  {:,} orders  {:,} lines  {}  (archived {})".format(
+                    year,
+                    file_name,
+                    orders,
+                    lines,
+                    format_money(revenue, True),
+                    archived_at,
+                )
+            )
+        return 0
+
+    size_before = database_size(db, args.db)
+    for year in sorted(args.years):
+        stats = db.archive_year(year)
+        if stats is None:
+            return 1
+        print(
+            "Archived {:,} orders ({:,} lines, {}) from {} to {}".format(
+                stats["orders"],
+                stats["order_lines"],
+                format_money(stats["revenue"], True),
+                year,
+                stats["file_name"],
+            )
+        )
+    # Give the archived rows' pages back to the filesystem.
+    db.conn.execute("VACUUM")
+    print(
+        "{}: {:,} KB -> {:,} KB".format(
+            args.db, size_before // 1024, database_size(db, args.db) // 1024
+        )
+    )
+    return 0
+
+
+def cmd_backup(db, args):
+    def progress(copied, total):
+        print(
+            "\r  {:,} / {:,} pages ({:.0%})".format(copied, total, copied / total),
+            end="",
+            flush=True,
+        )
+
+    stats = db.backup(args.dir, keep=args.keep, pages=args.pages, progress=progress)
+    print()
+    if stats is None:
+        return 1
+    print(
+        "Backed up {:,} pages to {} in {:.1f}s (quick_check ok)".format(
+            stats["pages"], stats["file"], stats["seconds"]
+        )
+    )
+    for name in stats["archives"]:
+        print("Copied archive " + name)
+    for name in stats["removed"]:
+        print("Removed old backup " + name)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DineSight database maintenance")
+    parser.add_argument("--db", default="dinesight.db", help="database file")
+    parser.add_argument("--profile", metavar="FILE", help="write query timings as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "rebuild-rollups", help="recompute the daily/hourly sales rollup tables"
+    ).set_defaults(func=cmd_rebuild_rollups)
+
+    importer = commands.add_parser(
+        "import", help="bulk-load historical sales from a CSV or JSON-lines file"
+    )
+    importer.add_argument("file", help="legacy sales export (.csv or .jsonl)")
+    importer.add_argument(
+        "--batch-size", type=int, default=50000, help="rows per transaction"
+    )
+    importer.set_defaults(func=cmd_import)
+
+    archiver = commands.add_parser(
+        "archive", help="move closed years into per-year archive files"
+    )
+    archiver.add_argument(
+        "years", nargs="*", type=int, help="years to archive (none: list archives)"
+    )
+    archiver.set_defaults(func=cmd_archive)
+
+    backup = commands.add_parser(
+        "backup", help="take a dated snapshot while the app keeps running"
+    )
+    backup.add_argument("--dir", default="backups", help="backup folder")
+    backup.add_argument(
+        "--keep", type=int, default=14, help="snapshots to keep (0 keeps all)"
+    )
+    backup.add_argument(
+        "--pages", type=int, default=1024, help="pages copied per step"
+    )
+    backup.set_defaults(func=cmd_backup)
+
+    args = parser.parse_args(argv)
+    db = RestaurantDatabaseManager(args.db)
+    profiler = None
+    if args.profile:
+        profiler = QueryProfiler()
+        profiler.attach(db)
+    try:
+        return args.func(db, args)
+    finally:
+        if profiler:
+            profiler.export_json(args.profile)
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Fill a database with a synthetic but realistic restaurant workload.
+
+Creates menu items across five categories, a pantry of ingredients with
+recipes, and years of sales ending today. Order volume follows an hourly
+curve (lunch and dinner peaks), a weekday curve (busy Fridays and
+Saturdays), a seasonal curve (summer high, December bump) and slow year
+on year growth; item popularity is long-tailed. The same --seed and --end
+always give the same database.
+
+    python generate_workload.py bench.db [--rows 1m] [--items 60] [--years 2]
+                                         [--seed 42] [--end YYYY-MM-DD]
+
+--rows is the approximate number of sales lines (10k, 1m, 10m, ...).
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+CATEGORIES = {
+    # category: (share of the menu, price range in cents)
+    "Starters": (0.15, (500, 1200)),
+    "Mains": (0.35, (900, 2400)),
+    "Sides": (0.15, (300, 800)),
+    "Desserts": (0.15, (400, 900)),
+    "Beverages": (0.20, (200, 600)),
+}
+
+# Relative order volume by hour of day (open 08:00-22:59) and by weekday.
+HOURLY = dict(zip(range(8, 23), (1, 2, 3, 8, 12, 10, 5, 3, 3, 5, 9, 11, 9, 5, 2)))
+WEEKDAY = (0.80, 0.85, 0.90, 1.00, 1.25, 1.35, 1.10)  # Monday first
+YEARLY_GROWTH = 0.08
+LINES_PER_ORDER = (1, 1, 2, 2, 2, 3, 3, 4)
+
+
+def parse_count(text):
+    """ "10k" -> 10000, "1m" -> 1000000, "2500" -> 2500."""
+    text = str(text).strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def day_weight(day, start):
+    season = 1 + 0.15 * math.sin(2 * math.pi * (day.month - 4) / 12)
+    if day.month == 12:
+        season += 0.10
+    growth = (1 + YEARLY_GROWTH) ** ((day - start).days / 365)
+    return WEEKDAY[day.weekday()] * season * growth
+
+
+def seed_menu(db, rng, n_items, day):
+    """Menu items, ingredients and recipes.
+
+    Returns: list of (id, name, category, price) for the menu.
+    """
+    menu = []
+    for category, (share, (low, high)) in CATEGORIES.items():
+        for number in range(1, max(1, round(n_items * share)) + 1):
+            price = rng.randrange(low, high + 1, 50)
+            menu.append((f"{category[:-1]} {number:02d}", category, price))
+    n_ingredients = max(10, len(menu) // 2)
+    day = day.isoformat()
+    db.cursor.executemany(
+        "INSERT INTO inventory (ingredient_name, current_stock, unit, minimum_threshold, "
+        "cost_per_unit, supplier, last_restocked) "
+        "VALUES (?, 1000000, 'unit', 50, ?, 'Wholesale', ?)",
+        # Deep stock, so benchmark checkouts are never short.
+        [
+            (f"Ingredient {i:03d}", round(rng.uniform(0.05, 3), 2), day)
+            for i in range(1, n_ingredients + 1)
+        ],
+    )
+    db.cursor.executemany(
+        "INSERT INTO menu_items (name, category, description, price, cost, "
+        "preparation_time, is_available, created_date, last_updated) "
+        "VALUES (?, ?, '', ?, ?, ?, 1, ?, ?)",
+        [
+            (name, category, price, price * 3 // 10, rng.randint(2, 25), day, day)
+            for name, category, price in menu
+        ],
+    )
+    db.cursor.executemany(
+        "INSERT INTO recipes (menu_item_id, ingredient_id, quantity_used) VALUES (?, ?, ?)",
+        [
+            (item_id, ingredient_id, round(rng.uniform(0.1, 2), 2))
+            for item_id in range(1, len(menu) + 1)
+            for ingredient_id in rng.sample(
+                range(1, n_ingredients + 1), rng.randint(2, 5)
+            )
+        ],
+    )
+    db.conn.commit()
+    db.cursor.execute("SELECT id, name, category, price FROM menu_items ORDER BY id")
+    return db.cursor.fetchall()
+
+
+def sales_rows(menu, rng, rows, years, end):
+    """Yield about `rows` sales lines as import_sales dicts, oldest first."""
+    start = end - timedelta(days=round(365 * years) - 1)
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    weights = [day_weight(day, start) for day in days]
+    mean_lines = sum(LINES_PER_ORDER) / len(LINES_PER_ORDER)
+    orders_per_weight = rows / mean_lines / sum(weights)
+
+    # Long-tailed popularity: the n-th most popular item sells ~1/n^0.8.
+    ranked = rng.sample(menu, len(menu))
+    popularity = [1 / (rank + 1) ** 0.8 for rank in range(len(ranked))]
+    hours, hour_weights = list(HOURLY), list(HOURLY.values())
+
+    order_id = 0
+    for day, weight in zip(days, weights):
+        expected = weight * orders_per_weight
+        count = int(expected) + (rng.random() < expected % 1)
+        times = sorted(
+            (rng.choices(hours, hour_weights)[0], rng.randrange(60), rng.randrange(60))
+            for _ in range(count)
+        )
+        for hour, minute, second in times:
+            order_id += 1
+            for _, name, category, price in rng.choices(
+                ranked, popularity, k=rng.choice(LINES_PER_ORDER)
+            ):
+                quantity = rng.choice((1, 1, 1, 2, 2, 3))
+                yield {
+                    "order_id": order_id,
+                    "item_name": name,
+                    "category": category,
+                    "quantity": quantity,
+                    "unit_price": f"{price / 100:.2f}",
+                    "total_amount": f"{price * quantity / 100:.2f}",
+                    "order_date": day.isoformat(),
+                    "order_time": f"{hour:02d}:{minute:02d}:{second:02d}",
+                }
+
+
+def generate(
+    path, rows=1_000_000, items=60, years=2, seed=42, end=None, progress=None
+):
+    """Create `path` and fill it. Returns: import_sales stats dict, or None."""
+    rng = random.Random(seed)
+    end = end or date.today()
+    db = RestaurantDatabaseManager(path)
+    try:
+        menu = seed_menu(db, rng, items, end)
+        return db.import_sales(
+            sales_rows(menu, rng, rows, years, end), progress=progress
+        )
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument(
+        "--rows", type=parse_count, default=1_000_000, help="sales lines (10k, 1m, ...)"
+    )
+    parser.add_argument("--items", type=int, default=60, help="menu items")
+    parser.add_argument("--years", type=float, default=2, help="years of history")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--end", type=date.fromisoformat, help="last day of sales (default today)"
+    )
+    parser.add_argument("--force", action="store_true", help="replace an existing file")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.path):
+        if not args.force:
+            print(f"{args.path} exists; pass --force to replace it")
+            return 1
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+    def progress(done, seconds):
+        rate = done / seconds if seconds else 0
+        print(f"\r  {done:,} rows  {rate:,.0f} rows/s", end="", flush=True)
+
+    start = time.perf_counter()
+    stats = generate(
+        args.path,
+        args.rows,
+        args.items,
+        args.years,
+        args.seed,
+        args.end,
+        progress=progress,
+    )
+    print()
+    if stats is None:
+        return 1
+    print(
+        "Generated {:,} sales lines in {:,} orders in {:.1f}s -> {}".format(
+            stats["rows"], stats["orders"], time.perf_counter() - start, args.path
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""Load-test concurrent POS terminals against one database file.
+
+Spawns N processes ("terminals") of --threads tills each, checking out
+random carts through RestaurantDatabaseManager.checkout_order for
+--duration seconds, the way several tills share dinesight.db during a
+rush. With --batched each process hands its checkouts to a SalesWriter,
+which journals them and records them in batches (group commit). A checkout that fails with
+"database is locked" is retried by the manager's RetryPolicy, up to
+--retries times. At the end it reports orders/sec, checkout latency
+percentiles, lock retries, time spent backing off and checkouts that gave
+up, and checks stock consistency: every recorded order's ingredients were
+deducted exactly once and no stock went negative. With --batched a
+confirmed order that comes up short at flush (another terminal used the
+stock first) is still recorded, overdrawing the stock; those are counted
+and negative stock is then expected.
+
+    python load_test.py [--terminals 4] [--threads 1] [--batched]
+                        [--duration 10] [--busy-timeout 5000]
+                        [--journal-mode wal|delete] [--think-ms 0]
+                        [--stock N] [--db copy_of_dinesight.db] [--json out.json]
+
+The test runs on a scratch copy (of --db, or of a small generated
+workload); the original file is never written.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from generate_workload import generate
+from RestaurantDatabaseManager import InsufficientStockError, RestaurantDatabaseManager
+from RetryPolicy import RetryPolicy
+from SalesWriter import SalesWriter
+
+
+def configure(journal_mode, busy_timeout):
+    """Swap the manager's connection PRAGMAs for this process."""
+    overrides = {"journal_mode": journal_mode.upper(), "busy_timeout": busy_timeout}
+    RestaurantDatabaseManager.PRAGMAS = tuple(
+        (pragma, overrides.get(pragma, value))
+        for pragma, value in RestaurantDatabaseManager.PRAGMAS
+    )
+
+
+def checkout(db, cart):
+    """checkout_order, classifying a failure by the exception behind it.
+
+    Returns: "ok", "short", "locked" or "error".
+    """
+    recorded, shortfalls = db.checkout_order(cart)
+    if recorded:
+        return "ok"
+    if shortfalls or isinstance(db.last_error, InsufficientStockError):
+        return "short"
+    if RetryPolicy.is_transient(db.last_error):
+        return "locked"
+    return "error"
+
+
+def till(db, rng, options, deadline, stats, latencies):
+    menu = [(item[0], item[4]) for item in db.get_menu_items()]
+    while time.perf_counter() < deadline:
+        cart = []
+        for item_id, price in rng.sample(menu, rng.randint(1, options["max_lines"])):
+            quantity = rng.randint(1, 3)
+            cart.append(
+                {
+                    "menu_item_id": item_id,
+                    "quantity": quantity,
+                    "unit_price": price,
+                    "total_amount": price * quantity,
+                }
+            )
+        sent = time.perf_counter()
+        outcome = checkout(db, cart)
+        latencies.append((time.perf_counter() - sent) * 1000)
+        stats[outcome] += 1
+        if options["think_ms"]:
+            time.sleep(options["think_ms"] / 1000)
+
+
+def terminal(number, path, options, start, results):
+    """One process: --threads tills, sharing a SalesWriter if --batched."""
+    configure(options["journal_mode"], options["busy_timeout"])
+    # The manager prints every failed checkout; they are counted instead.
+    sys.stdout = open(os.devnull, "w")
+    policies = []
+
+    def retry_policy():
+        policies.append(
+            RetryPolicy(max_attempts=options["retries"] + 1, seed=len(policies))
+        )
+        return policies[-1]
+
+    writer = None
+    if options["batched"]:
+        writer = SalesWriter(
+            path,
+            retry_policy=retry_policy(),
+            # Both counted in writer.stats.
+            on_rejected=lambda order, reason: None,
+            on_overdrawn=lambda order, ingredient_ids: None,
+        )
+    dbs = []
+    for _ in range(options["threads"]):
+        dbs.append(RestaurantDatabaseManager(path, retry_policy=retry_policy()))
+        dbs[-1].sales_writer = writer
+    stats = {"ok": 0, "short": 0, "error": 0, "locked": 0}
+    latencies = []
+
+    start.wait()
+    began = time.perf_counter()
+    deadline = began + options["duration"]
+    tills = [
+        threading.Thread(
+            target=till,
+            args=(
+                db,
+                random.Random(options["seed"] * 1000 + number * 100 + n),
+                options,
+                deadline,
+                stats,
+                latencies,
+            ),
+        )
+        for n, db in enumerate(dbs)
+    ]
+    for thread in tills:
+        thread.start()
+    for thread in tills:
+        thread.join()
+    stats["seconds"] = time.perf_counter() - began
+
+    for key in ("rejected", "overdrawn", "journal_syncs", "flushes"):
+        stats[key] = 0
+    if writer:
+        writer.close()
+        for key in ("rejected", "overdrawn", "journal_syncs", "flushes"):
+            stats[key] = writer.stats[key]
+    stats["latencies"] = latencies
+    stats["retries"] = stats["retry_wait_ms"] = 0
+    for policy in policies:
+        for counts in policy.stats().values():
+            stats["retries"] += counts["retries"]
+            stats["retry_wait_ms"] += counts["wait_ms"]
+    for db in dbs:
+        db.close()
+    results.put(stats)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def prepare(workdir, source, stock, journal_mode, seed):
+    path = os.path.join(workdir, "load_test.db")
+    if source:
+        shutil.copyfile(source, path)
+    else:
+        generate(path, rows=20_000, items=40, years=1, seed=seed)
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    if stock is not None:
+        conn.execute("UPDATE inventory SET current_stock = ?", (stock,))
+        conn.commit()
+    conn.close()
+    # Reopening refreshes menu availability for the new stock levels.
+    RestaurantDatabaseManager(path).close()
+    return path
+
+
+def snapshot(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            "last_order_id": conn.execute("SELECT IFNULL(MAX(id), 0) FROM orders").fetchone()[0],
+            "stock": dict(conn.execute("SELECT id, current_stock FROM inventory")),
+        }
+    finally:
+        conn.close()
+
+
+def check_consistency(path, before, recorded, allow_negative=False):
+    """Returns: list of problems; empty if every deduction adds up."""
+    problems = []
+    conn = sqlite3.connect(path)
+    try:
+        new_orders = conn.execute(
+            "SELECT COUNT(*) FROM orders WHERE id > ?", (before["last_order_id"],)
+        ).fetchone()[0]
+        if new_orders != recorded:
+            problems.append(
+                f"terminals recorded {recorded} orders, database has {new_orders}"
+            )
+        expected = dict(
+            conn.execute(
+                """
+                SELECT r.ingredient_id, SUM(l.quantity * r.quantity_used)
+                FROM order_lines l
+                JOIN recipes r ON r.menu_item_id = l.menu_item_id
+                WHERE l.order_id > ?
+                GROUP BY r.ingredient_id
+            """,
+                (before["last_order_id"],),
+            )
+        )
+        for ingredient_id, stock in conn.execute("SELECT id, current_stock FROM inventory"):
+            deducted = before["stock"][ingredient_id] - stock
+            if abs(deducted - expected.get(ingredient_id, 0)) > 1e-6:
+                problems.append(
+                    f"ingredient {ingredient_id}: deducted {deducted:.3f}, "
+                    f"orders used {expected.get(ingredient_id, 0):.3f}"
+                )
+            if stock < -1e-9 and not allow_negative:
+                problems.append(f"ingredient {ingredient_id}: stock went negative ({stock})")
+    finally:
+        conn.close()
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terminals", type=int, default=4, help="concurrent processes")
+    parser.add_argument("--threads", type=int, default=1, help="tills per process")
+    parser.add_argument(
+        "--batched",
+        action="store_true",
+        help="checkouts go through a SalesWriter per process (group commit)",
+    )
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--busy-timeout", type=int, default=5000, help="ms")
+    parser.add_argument("--journal-mode", default="wal", choices=("wal", "delete"))
+    parser.add_argument(
+        "--retries", type=int, default=5, help="retries of a locked checkout"
+    )
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between carts")
+    parser.add_argument("--max-lines", type=int, default=4, help="cart lines")
+    parser.add_argument(
+        "--stock", type=float, help="set every ingredient's stock (e.g. 200 to run short)"
+    )
+    parser.add_argument("--db", help="database to copy (default: generated workload)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    options = {
+        "duration": args.duration,
+        "busy_timeout": args.busy_timeout,
+        "journal_mode": args.journal_mode,
+        "retries": args.retries,
+        "think_ms": args.think_ms,
+        "max_lines": args.max_lines,
+        "seed": args.seed,
+        "threads": args.threads,
+        "batched": args.batched,
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        path = prepare(workdir, args.db, args.stock, args.journal_mode, args.seed)
+        before = snapshot(path)
+
+        context = multiprocessing.get_context("spawn")
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=terminal, args=(n, path, options, start, results))
+            for n in range(args.terminals)
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(1)  # let every terminal open its connection
+        start.set()
+        stats = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        latencies = [ms for terminal_stats in stats for ms in terminal_stats["latencies"]]
+        totals = {
+            key: sum(terminal_stats[key] for terminal_stats in stats)
+            for key in (
+                "ok",
+                "short",
+                "error",
+                "locked",
+                "retries",
+                "retry_wait_ms",
+                "rejected",
+                "overdrawn",
+                "journal_syncs",
+                "flushes",
+            )
+        }
+        seconds = max(terminal_stats["seconds"] for terminal_stats in stats)
+        # Only a malformed batched order is turned down at flush; one that
+        # comes up short is recorded, overdrawing the stock.
+        problems = check_consistency(
+            path,
+            before,
+            totals["ok"] - totals["rejected"],
+            allow_negative=totals["overdrawn"] > 0,
+        )
+
+    report = {
+        "terminals": args.terminals,
+        "threads": args.threads,
+        "batched": args.batched,
+        "journal_mode": args.journal_mode,
+        "busy_timeout_ms": args.busy_timeout,
+        "seconds": round(seconds, 2),
+        "checkouts": len(latencies),
+        "orders": totals["ok"],
+        "orders_per_second": round(totals["ok"] / seconds, 1) if seconds else 0,
+        "short": totals["short"],
+        "errors": totals["error"],
+        "lock_retries": totals["retries"],
+        "retry_wait_ms": round(totals["retry_wait_ms"], 1),
+        "gave_up": totals["locked"],
+        "rejected_at_flush": totals["rejected"],
+        "overdrawn_at_flush": totals["overdrawn"],
+        "journal_syncs": totals["journal_syncs"],
+        "flushes": totals["flushes"],
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(max(latencies, default=0), 2),
+        },
+        "consistent": not problems,
+        "problems": problems,
+    }
+
+    print(
+        "{terminals} terminals x {threads} tills{mode}, {journal_mode}, "
+        "busy_timeout {busy_timeout_ms} ms, {seconds}s".format(
+            mode=", batched" if args.batched else "", **report
+        )
+    )
+    print(
+        "  {orders:,} orders ({orders_per_second:,} /s), {short:,} short, "
+        "{errors:,} failed".format(**report)
+    )
+    print(
+        "  latency p50 {p50} ms  p95 {p95} ms  p99 {p99} ms  max {max} ms".format(
+            **report["latency_ms"]
+        )
+    )
+    print(
+        "  lock retries {lock_retries:,} ({retry_wait_ms:,} ms backing off), "
+        "{gave_up:,} gave up".format(**report)
+    )
+    if args.batched:
+        print(
+            "  {journal_syncs:,} journal fsyncs, {flushes:,} database flushes, "
+            "{overdrawn_at_flush:,} overdrawn and {rejected_at_flush:,} rejected "
+            "at flush".format(**report)
+        )
+    print(
+        "  stock consistency: "
+        + ("ok" if not problems else "FAILED\n    " + "\n    ".join(problems))
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not problems else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
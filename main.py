@@ -1,13 +1,18 @@
 import os
+import queue
 import tkinter as tk
-from tkinter import ttk
+from tkinter import messagebox, ttk
 
 import sv_ttk
 
 from Dashboard import Dashboard
+from DatabaseWorker import DatabaseWorker
 from InventoryManagement import InventoryManagement
 from MenuTracker import MenuTracker
+from QueryProfiler import QueryProfiler
+from RestaurantDatabaseManager import RestaurantDatabaseManager, format_money
 from SalesLogger import SalesLogger
+from SalesWriter import SalesWriter
 from TrendsAnalysis import TrendsAnalysis
 
 
@@ -54,6 +59,36 @@ class DineSightApp(tk.Tk):
             "card_shadow": "#e2e8f0",
         }
 
+        # One database connection for quick calls on the Tk thread, plus a
+        # worker thread with its own connection for anything that may block.
+        self.db = RestaurantDatabaseManager()
+        # Set DINESIGHT_PROFILE=1 to time every query; Ctrl+Shift+P writes
+        # the numbers to query_profile.json (also written on exit).
+        self.profiler = QueryProfiler.from_env()
+        if self.profiler:
+            self.profiler.attach(self.db)
+            self.bind_all("<Control-P>", lambda e: self.export_profile())
+        # Checkouts go to the sales writer's journal and reach the database
+        # in batches, so a long report or backup never holds up the till.
+        # What the writer finds when an order reaches the database (the
+        # stock went to another till first, or the order is malformed) is
+        # reported to the cashier.
+        self._writer_reports = queue.Queue()
+        self.sales_writer = SalesWriter(
+            self.db.db_name,
+            on_rejected=lambda order, reason: self._writer_reports.put(
+                ("rejected", order, reason)
+            ),
+            on_overdrawn=lambda order, ingredient_ids: self._writer_reports.put(
+                ("overdrawn", order, ingredient_ids)
+            ),
+        )
+        self._writer_poll_id = self.after(250, self.poll_writer_reports)
+        self.worker = DatabaseWorker(
+            self, self.db.db_name, self.profiler, self.sales_writer
+        )
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.configure(bg=self.colors["background"])
         self.load_icon()
         self.setup_theme()
@@ -73,6 +108,63 @@ class DineSightApp(tk.Tk):
         self.bind("<Configure>", self._on_window_resize)
         self._last_width = self.winfo_width()
 
+    def poll_writer_reports(self):
+        self.show_writer_reports()
+        self._writer_poll_id = self.after(250, self.poll_writer_reports)
+
+    def show_writer_reports(self):
+        # The writer reports from its own thread; Tk is only touched here.
+        while True:
+            try:
+                kind, order, detail = self._writer_reports.get_nowait()
+            except queue.Empty:
+                return
+            order = order or {}
+            if kind == "overdrawn":
+                names = []
+                for ingredient_id in detail:
+                    item = self.db.get_inventory_item_by_id(ingredient_id)
+                    names.append(item[1] if item else f"Ingredient {ingredient_id}")
+                messagebox.showwarning(
+                    "Stock Below Zero",
+                    "The order taken at {} was recorded, but another till used "
+                    "the stock first. These are now below zero in inventory:"
+                    "\n- {}\n\nRecount these and correct their stock.".format(
+                        order.get("taken_at", "?"), "\n- ".join(names)
+                    ),
+                )
+                continue
+            items = []
+            for line in order.get("lines") or []:
+                item = self.db.get_menu_item_by_id(line.get("menu_item_id"))
+                items.append(
+                    "- {} x{}  {}".format(
+                        item[1] if item else "Item {}".format(line.get("menu_item_id")),
+                        line.get("quantity"),
+                        format_money(line.get("total_amount")),
+                    )
+                )
+            messagebox.showerror(
+                "Order Not Recorded",
+                "The order taken at {} could not be saved and was dropped:\n"
+                "{}\n\nReason: {}".format(
+                    order.get("taken_at", "?"), "\n".join(items), detail
+                ),
+            )
+
+    def on_close(self):
+        self.after_cancel(self._writer_poll_id)
+        self.worker.close()
+        self.sales_writer.close()
+        self.show_writer_reports()  # from the final flush
+        if self.profiler:
+            self.export_profile()
+        self.db.close()
+        self.destroy()
+
+    def export_profile(self):
+        print(f"Query profile written to {self.profiler.export_json()}")
+
     def load_icon(self):
         icon_paths = [
             os.path.join(os.path.dirname(os.path.abspath(__file__)), "DineSight.ico"),
@@ -492,35 +584,35 @@ class DineSightApp(tk.Tk):
 
     def show_sales_logger(self):
         self.clear_frame()
-        content = SalesLogger(self.current_frame, self.colors)
+        content = SalesLogger(self.current_frame, self.colors, self.db, self.worker)
         content.pack(fill="both", expand=True)
         if self.nav_buttons:
             self.set_active_button(self.nav_buttons[3])
 
     def show_dashboard(self):
         self.clear_frame()
-        content = Dashboard(self.current_frame, self.colors)
+        content = Dashboard(self.current_frame, self.colors, self.db, self.worker)
         content.pack(fill="both", expand=True)
         if self.nav_buttons:
             self.set_active_button(self.nav_buttons[0])
 
     def show_menu_tracker(self):
         self.clear_frame()
-        content = MenuTracker(self.current_frame, self.colors)
+        content = MenuTracker(self.current_frame, self.colors, self.db)
         content.pack(fill="both", expand=True)
         if self.nav_buttons:
             self.set_active_button(self.nav_buttons[1])
 
     def show_inventory(self):
         self.clear_frame()
-        content = InventoryManagement(self.current_frame, self.colors)
+        content = InventoryManagement(self.current_frame, self.colors, self.db)
         content.pack(fill="both", expand=True)
         if self.nav_buttons:
             self.set_active_button(self.nav_buttons[2])
 
     def show_trends(self):
         self.clear_frame()
-        content = TrendsAnalysis(self.current_frame, self.colors)
+        content = TrendsAnalysis(self.current_frame, self.colors, self.db, self.worker)
         content.pack(fill="both", expand=True)
         if self.nav_buttons:
             self.set_active_button(self.nav_buttons[4])
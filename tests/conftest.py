@@ -0,0 +1,10 @@
+import pytest
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RestaurantDatabaseManager(str(tmp_path / "test.db"))
+    yield db
+    db.close()
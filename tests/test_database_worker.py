@@ -0,0 +1,27 @@
+"""DatabaseWorker start-up and calls, with a stand-in for the Tk root."""
+
+import pytest
+
+from DatabaseWorker import DatabaseWorker
+
+
+class Root:
+    def after(self, ms, callback):
+        return "after#1"
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def test_failed_start_up_is_raised_not_hung(tmp_path):
+    # A directory cannot be opened as a database.
+    with pytest.raises(Exception):
+        DatabaseWorker(Root(), str(tmp_path))
+
+
+def test_calls_run_on_the_worker(tmp_path):
+    worker = DatabaseWorker(Root(), str(tmp_path / "test.db"))
+    try:
+        assert worker.submit("get_schema_version").result(timeout=5) > 0
+    finally:
+        worker.close()
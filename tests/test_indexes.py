@@ -0,0 +1,81 @@
+"""The hot queries must be answered through an index, not a table scan."""
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+
+
+def plan(db, sql, params=()):
+    return [row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def uses_index(details, table, index):
+    return any(
+        detail.startswith(f"SEARCH {table} ")
+        and (f"USING INDEX {index} " in detail or f"USING COVERING INDEX {index} " in detail)
+        for detail in details
+    )
+
+
+def test_date_range_sales_query_uses_timestamp_index(db):
+    where, params = db._sales_filter(("2024-01-01", "2024-01-31"))
+    details = plan(db, "SELECT * FROM sales" + where, params)
+    assert uses_index(details, "o", "idx_orders_ts"), details
+    assert not any(detail.startswith("SCAN o") for detail in details), details
+
+
+def test_date_range_and_category_query_uses_timestamp_index(db):
+    where, params = db._sales_filter(("2024-01-01", "2024-01-31"), "Mains")
+    details = plan(db, "SELECT * FROM sales" + where, params)
+    assert uses_index(details, "o", "idx_orders_ts"), details
+
+
+def test_recipe_lookup_by_menu_item_uses_index(db):
+    details = plan(
+        db,
+        "SELECT ingredient_id, quantity_used FROM recipes WHERE menu_item_id IN (?, ?)",
+        (1, 2),
+    )
+    assert uses_index(details, "recipes", "idx_recipes_menu_item"), details
+
+
+def test_reverse_recipe_lookup_uses_index(db):
+    details = plan(
+        db,
+        "SELECT DISTINCT menu_item_id FROM recipes WHERE ingredient_id IN (?, ?)",
+        (1, 2),
+    )
+    assert uses_index(details, "recipes", "idx_recipes_ingredient"), details
+
+
+
+BUCKET_INDEXES = ("idx_orders_hour", "idx_orders_weekday", "idx_orders_year_month")
+
+
+def orders_indexes(db):
+    cursor = db.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'orders'"
+    )
+    return {name for (name,) in cursor}
+
+
+def test_unused_time_bucket_indexes_are_dropped_on_upgrade(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = RestaurantDatabaseManager(path)
+    assert not orders_indexes(db) & set(BUCKET_INDEXES)
+    # A schema v8 database still has them.
+    db.cursor.execute("CREATE INDEX idx_orders_hour ON orders (order_hour, total_amount)")
+    db.cursor.execute(
+        "CREATE INDEX idx_orders_weekday ON orders (order_weekday, total_amount)"
+    )
+    db.cursor.execute(
+        "CREATE INDEX idx_orders_year_month ON orders (year_month, total_amount)"
+    )
+    db.cursor.execute("PRAGMA user_version = 8")
+    db.conn.commit()
+    db.close()
+
+    db = RestaurantDatabaseManager(path)
+    try:
+        assert not orders_indexes(db) & set(BUCKET_INDEXES)
+        assert "idx_orders_ts" in orders_indexes(db)
+    finally:
+        db.close()
@@ -0,0 +1,68 @@
+"""Menu availability follows stock, recipes and retirement."""
+
+
+def burger(db, stock=10):
+    db.add_inventory_item("Bun", stock, "pc", 1, 0.3, "", "")
+    db.add_inventory_item("Patty", stock, "pc", 1, 1.0, "", "")
+    db.add_menu_item("Burger", "Mains", "", 950, 300, 5)
+    db.add_recipe_item(1, 1, 1)
+    db.add_recipe_item(1, 2, 1)
+    db.check_and_update_all_menu_availability()
+
+
+def is_available(db, item_id=1):
+    return bool(db.get_menu_item_by_id(item_id)[7])
+
+
+def test_item_with_stock_is_available(db):
+    burger(db)
+    assert is_available(db)
+
+
+def test_item_short_of_an_ingredient_is_unavailable(db):
+    burger(db, stock=0)
+    assert not is_available(db)
+
+
+def test_item_whose_ingredient_was_deleted_is_unavailable(db):
+    burger(db)
+    db.cursor.execute("DELETE FROM inventory WHERE id = 2")
+    db.conn.commit()
+    db.check_and_update_all_menu_availability()
+    assert not is_available(db)
+
+
+def test_item_whose_ingredient_was_deleted_cannot_be_sold(db):
+    burger(db)
+    db.delete_inventory_item(2)
+    assert not db.check_stock_for_sale(1, 1)
+    line = {"menu_item_id": 1, "quantity": 1, "unit_price": 950, "total_amount": 950}
+    recorded, shortfalls = db.checkout_order([line])
+    assert not recorded
+    assert [(ingredient_id, stock) for ingredient_id, *_, stock in shortfalls] == [(2, 0)]
+    assert not db.record_order([line])
+    assert db.conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0
+
+
+def test_retired_item_stays_unavailable(db):
+    burger(db)
+    db.cursor.execute("UPDATE menu_items SET is_retired = 1, is_available = 0")
+    db.conn.commit()
+    db.check_and_update_all_menu_availability()
+    db.update_menu_availability_for_ingredients([1, 2])
+    assert not is_available(db)
+
+
+def test_ingredient_change_rechecks_only_its_items(db):
+    burger(db)
+    db.add_inventory_item("Syrup", 0, "l", 1, 2.0, "", "")
+    db.add_menu_item("Soda", "Drinks", "", 200, 50, 1)
+    db.add_recipe_item(2, 3, 1)
+    db.cursor.execute("UPDATE inventory SET current_stock = 0 WHERE id = 1")
+    db.cursor.execute("UPDATE inventory SET current_stock = 5 WHERE id = 3")
+    db.conn.commit()
+    db.update_menu_availability_for_ingredients([3])
+    assert is_available(db, 1)
+    assert is_available(db, 2)
+    db.update_menu_availability_for_ingredients([1])
+    assert not is_available(db, 1)
@@ -0,0 +1,64 @@
+"""Recording orders, and telling why one was not recorded."""
+
+from RestaurantDatabaseManager import InsufficientStockError
+
+
+def burger_line(quantity):
+    return {
+        "menu_item_id": 1,
+        "quantity": quantity,
+        "unit_price": 950,
+        "total_amount": 950 * quantity,
+    }
+
+
+def setup_burger(db, stock):
+    db.add_inventory_item("Bun", stock, "pc", 1, 0.3, "", "")
+    db.add_menu_item("Burger", "Mains", "", 950, 300, 5)
+    db.add_recipe_item(1, 1, 1)
+
+
+def test_recorded_order_clears_last_error(db):
+    setup_burger(db, 5)
+    assert db.record_order([burger_line(2)])
+    assert db.last_error is None
+    assert db.get_inventory_item_by_id(1)[2] == 3
+
+
+def test_short_order_reports_insufficient_stock(db):
+    setup_burger(db, 1)
+    assert not db.record_order([burger_line(2)])
+    assert isinstance(db.last_error, InsufficientStockError)
+    assert db.get_inventory_item_by_id(1)[2] == 1
+
+
+def batch_entry(order_ref, lines):
+    return {"order_ref": order_ref, "taken_at": "2026-01-02 12:00:00", "lines": lines}
+
+
+def test_record_orders_rejects_bad_orders_on_their_own(db):
+    setup_burger(db, 2)
+    result = db.record_orders(
+        [
+            batch_entry("good", [burger_line(1)]),
+            batch_entry("malformed", [dict(burger_line(1), quantity=None)]),
+            batch_entry("also-good", [burger_line(1)]),
+        ]
+    )
+    assert [order_ref for order_ref, _ in result["rejected"]] == ["malformed"]
+    assert result["overdrawn"] == []
+    refs = {ref for (ref,) in db.conn.execute("SELECT order_ref FROM orders")}
+    assert refs == {"good", "also-good"}
+    assert db.get_inventory_item_by_id(1)[2] == 0
+
+
+def test_record_orders_records_a_sold_order_even_when_short(db):
+    setup_burger(db, 2)
+    result = db.record_orders([batch_entry("sold", [burger_line(5)])])
+    assert result == {"rejected": [], "overdrawn": [("sold", [1])]}
+    refs = {ref for (ref,) in db.conn.execute("SELECT order_ref FROM orders")}
+    assert refs == {"sold"}
+    # Below zero, so it shows in the low-stock list for a recount.
+    assert db.get_inventory_item_by_id(1)[2] == -3
+    assert [row[0] for row in db.get_inventory(low_stock_only=True)] == [1]
+    assert not db.get_menu_item_by_id(1)[7]
@@ -0,0 +1,30 @@
+"""Runs check_query_plans as part of the suite."""
+
+import json
+import sqlite3
+
+import pytest
+
+import check_query_plans
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    return check_query_plans.record_plans(str(tmp_path_factory.mktemp("plans")))
+
+
+def test_checkout_path_uses_indexes(plans):
+    assert check_query_plans.hot_scans(plans) == []
+
+
+def test_plans_match_baseline(plans):
+    with open(check_query_plans.BASELINE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["sqlite_version"] != sqlite3.sqlite_version:
+        pytest.skip(f"baseline recorded with SQLite {baseline['sqlite_version']}")
+    assert check_query_plans.compare(baseline["methods"], plans) == []
+
+
+def test_a_scan_on_the_checkout_path_is_reported():
+    plans = {"record_order": {"UPDATE menu_items SET x = 1": ["SCAN menu_items"]}}
+    assert len(check_query_plans.hot_scans(plans)) == 1
@@ -0,0 +1,35 @@
+"""The rollups stay in step with orders, even after an interrupted import."""
+
+from RestaurantDatabaseManager import SALES_TRIGGERS, RestaurantDatabaseManager
+
+
+def daily_orders(db):
+    cursor = db.conn.execute("SELECT COALESCE(SUM(orders), 0) FROM orders_daily")
+    return cursor.fetchone()[0]
+
+
+def test_reopen_repairs_triggers_dropped_by_a_killed_import(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = RestaurantDatabaseManager(path)
+    db.add_menu_item("Soda", "Drinks", "", 200, 50, 1)
+    # What import_sales leaves behind if it dies between batches.
+    for name in SALES_TRIGGERS:
+        db.cursor.execute(f"DROP TRIGGER {name}")
+    db.cursor.execute(
+        "INSERT INTO orders (order_ts, line_count, items_sold, total_amount) "
+        "VALUES (1700000000, 1, 1, 200)"
+    )
+    db.conn.commit()
+    assert daily_orders(db) == 0
+    db.close()
+
+    db = RestaurantDatabaseManager(path)
+    try:
+        assert daily_orders(db) == 1
+        assert db.record_order(
+            [{"menu_item_id": 1, "quantity": 1, "unit_price": 200, "total_amount": 200}]
+        )
+        assert daily_orders(db) == 2
+        assert not db.repair_sales_triggers()
+    finally:
+        db.close()
@@ -0,0 +1,157 @@
+"""SalesWriter journals: one per writer, orphans replayed, owned ones cleaned up."""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from RestaurantDatabaseManager import RestaurantDatabaseManager
+from SalesWriter import SalesWriter, _try_lock
+
+
+def burger_line(quantity=1):
+    return {
+        "menu_item_id": 1,
+        "quantity": quantity,
+        "unit_price": 950,
+        "total_amount": 950 * quantity,
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = RestaurantDatabaseManager(path)
+    db.add_inventory_item("Bun", 10, "pc", 1, 0.3, "", "")
+    db.add_menu_item("Burger", "Mains", "", 950, 300, 5)
+    db.add_recipe_item(1, 1, 1)
+    db.close()
+    return path
+
+
+def write_journal(path, *order_refs, line=None):
+    entries = [
+        {
+            "order_ref": order_ref,
+            "taken_at": "2026-01-02 12:00:00",
+            "lines": [line or burger_line()],
+            "demand": {"1": 1},
+        }
+        for order_ref in order_refs
+    ]
+    Path(path).write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+def recorded_refs(db_path):
+    db = RestaurantDatabaseManager(db_path)
+    try:
+        return {ref for (ref,) in db.conn.execute("SELECT order_ref FROM orders")}
+    finally:
+        db.close()
+
+
+def journals(db_path):
+    return sorted(Path(db_path).parent.glob("*.journal"))
+
+
+def test_each_writer_has_its_own_journal(db_path):
+    first, second = SalesWriter(db_path), SalesWriter(db_path)
+    try:
+        assert first.journal_path != second.journal_path
+        assert len(journals(db_path)) == 2
+    finally:
+        first.close()
+        second.close()
+    assert journals(db_path) == []
+
+
+def test_orphaned_journal_is_replayed_and_removed(db_path):
+    orphan = Path(db_path).with_name("test.0123456789ab.journal")
+    write_journal(orphan, "crashed-till")
+    writer = SalesWriter(db_path)
+    try:
+        assert writer.stats["replayed"] == 1
+        assert writer.sync()
+    finally:
+        writer.close()
+    assert "crashed-till" in recorded_refs(db_path)
+    assert not orphan.exists()
+
+
+def test_a_running_writers_journal_is_left_alone(db_path):
+    live = Path(db_path).with_name("test.live0000000.journal")
+    write_journal(live, "still-pending")
+    with open(live, "r+b") as held:
+        assert _try_lock(held)
+        writer = SalesWriter(db_path)
+        try:
+            assert writer.submit([burger_line()], "new-order", {1: 1})
+            assert writer.sync()
+            assert writer.stats["replayed"] == 0
+        finally:
+            writer.close()
+        assert live.read_text().strip()
+    assert recorded_refs(db_path) == {"new-order"}
+
+
+def test_a_bad_order_is_reported_and_does_not_block_the_rest(db_path):
+    orphan = Path(db_path).with_name("test.0123456789ab.journal")
+    write_journal(orphan, "bad", line=dict(burger_line(), quantity=None))
+    rejected = []
+    writer = SalesWriter(
+        db_path, on_rejected=lambda order, reason: rejected.append(order["order_ref"])
+    )
+    try:
+        writer.submit([burger_line()], "good", {1: 1})
+        assert writer.sync()
+    finally:
+        writer.close()
+    assert rejected == ["bad"]
+    assert recorded_refs(db_path) == {"good"}
+    assert not orphan.exists()
+
+
+def test_a_confirmed_order_short_at_flush_is_still_recorded(db_path):
+    orphan = Path(db_path).with_name("test.0123456789ab.journal")
+    write_journal(orphan, "sold", line=burger_line(12))
+    overdrawn = []
+    writer = SalesWriter(
+        db_path,
+        on_overdrawn=lambda order, ingredient_ids: overdrawn.append(
+            (order["order_ref"], ingredient_ids)
+        ),
+    )
+    try:
+        assert writer.sync()
+        assert writer.stats["overdrawn"] == 1
+    finally:
+        writer.close()
+    assert overdrawn == [("sold", [1])]
+    assert recorded_refs(db_path) == {"sold"}
+
+
+def test_stock_and_reservations_are_read_in_one_step(db_path):
+    writer = SalesWriter(db_path, flush_interval=0.01)
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        writer.submit([burger_line()], "first", {1: 1})
+        assert writer.sync()  # the writer is up and has its connection
+        # Hold the write lock so the writer is mid-flush when we look.
+        blocker.execute("BEGIN IMMEDIATE")
+        writer.submit([burger_line(4)], "held", {1: 4})
+        time.sleep(0.2)
+        with writer.pending_demand() as pending:
+            blocker.execute("ROLLBACK")
+            time.sleep(0.3)  # the batch is written, but must not commit yet
+            orders = blocker.execute("SELECT COUNT(*) FROM orders").fetchone()
+            stock = blocker.execute("SELECT current_stock FROM inventory").fetchone()
+        assert (pending, orders, stock) == ({1: 4}, (1,), (9,))
+        assert writer.sync()
+        with writer.pending_demand() as pending:
+            assert pending == {}
+    finally:
+        blocker.close()
+        writer.close()
+    assert recorded_refs(db_path) == {"first", "held"}